@@ -1,22 +1,20 @@
-import cv2
 import sys
 import os
 
 from threading import Thread
-from time import sleep
 from datetime import datetime
+
+from manager.StartupProfile import startup
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, 
     QPushButton, QLabel, QHBoxLayout, 
     QTextEdit, QGroupBox, QGridLayout, 
-    QSizePolicy, QStackedLayout, QMessageBox,
+    QSizePolicy, QStackedLayout,
+    QComboBox, QCheckBox, QPlainTextEdit,
 )
 from PySide6.QtCore import (
     Qt, QTimer,
 )
-from PySide6.QtGui import ( 
-    QImage, QPixmap, 
-)
 
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manager'))
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'drone_capture'))
@@ -24,7 +22,25 @@ sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'drone_
 from manager.MetricsSystem import MetricsSystem
 from manager.Controller import Controller
 from manager.CameraFilter import CameraFilter
-from manager.Log import Log
+from manager.Log import Log, setup_logging
+from manager.VideoWidget import VideoWidget
+from manager.Sparkline import Sparkline
+from manager.Telemetry import format_value
+from manager.Instrumentation import metrics, format_snapshot
+from manager.QtBridge import SessionSignals
+
+# The startup breakdown is logged once these are reached, or after the timeout
+STARTUP_MILESTONES = ("window shown", "sdk handshake", "first telemetry", "first frame")
+STARTUP_REPORT_TIMEOUT = 15000
+
+# GUI telemetry updates per second at most; the Tello sends about ten
+TELEMETRY_RATE = 10
+BATTERY_WARNING_LEVEL = 15
+BATTERY_ALERT_MS = 10000
+# Wait between attempts while the drone does not answer the handshake
+RECONNECT_INTERVAL_MS = 3000
+
+startup.mark("imports")
 
 class SoftwareGCS(QWidget):
     def __init__(self, MetricsSystem):
@@ -32,11 +48,10 @@ class SoftwareGCS(QWidget):
         self.MetricsSystem = MetricsSystem  
         self.Controller = Controller()
         
-        self.log_text_edit = QTextEdit()  
+        self.log_text_edit = QPlainTextEdit()
         self.log_text_edit.setReadOnly(True) 
         
-        self.Log = Log(self.log_text_edit)  
-        self.MetricsSystem.log_action = self.Log.log_callback  
+        self.Log = Log(self.log_text_edit)
         
         self.CameraFilter = CameraFilter()
         self.init_ui()
@@ -51,26 +66,58 @@ class SoftwareGCS(QWidget):
         self.video_label.setLayout(QVBoxLayout())
         self.video_label.layout().addWidget(self.status_message, alignment=Qt.AlignTop | Qt.AlignLeft)
 
-        if self.MetricsSystem.init_sdk_mode():
-            self.state_thread = Thread(target=self.MetricsSystem.receive_state, daemon=True)
-            self.state_thread.start()
-
-        self.MetricsSystem.start_video_stream()
-        self.MetricsSystem.apply_filter = self.CameraFilter.apply_filter
-
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_video_feed)
-        self.timer.start(50)
-
-        self.telemetry_timer = QTimer(self)
-        self.telemetry_timer.timeout.connect(self.update_telemetry_metrics)
-        self.telemetry_timer.start(1000)
+        self.alert_timer = QTimer(self)
+        self.alert_timer.setSingleShot(True)
+        self.alert_timer.timeout.connect(lambda: self.video_label.set_alert(None))
+
+        # Telemetry and command replies arrive on the network thread and are
+        # handed to the GUI thread as queued signals, and only when a field
+        # the labels show has changed. The plots read every state packet
+        # from the flight recorder's history on a timer of their own
+        displayed = frozenset(field for fields, _, _ in self.telemetry_labels for field in fields)
+        self.session_signals = SessionSignals(
+            self.MetricsSystem, self, telemetry_rate=TELEMETRY_RATE, fields=displayed
+        )
+        self.session_signals.telemetry.connect(self.update_telemetry_metrics)
+        self.session_signals.command_finished.connect(self.log_command_result)
+        self.session_signals.connected.connect(self.drone_connected)
+
+        self.MetricsSystem.set_apply_filter(self.CameraFilter.apply_filter)
+        self.video_label.frame_ready.connect(self.update_video_feed)
+        self.video_label.set_pipeline(self.MetricsSystem.frame_pipeline)
+        self.first_frame_shown = False
+        self.first_telemetry_shown = False
+
+        # The window comes up right away; the handshake and stream start run
+        # in the background and the joystick is picked up whenever it appears
+        startup.expect(*STARTUP_MILESTONES)
+        QTimer.singleShot(STARTUP_REPORT_TIMEOUT, startup.report)
+        self.connect_thread = None
+        self.connect_failures = 0
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.connect_drone)
+        self.connect_drone()
 
         self.joystick_timer = QTimer(self)
         self.joystick_timer.timeout.connect(lambda: self.Controller.update_joystick_display(self.joystick_display_widget))
         self.joystick_timer.start(100)
 
-        self.joystick_thread = Thread(target=self.Controller.run_joystick_control, args=(self.MetricsSystem, self.recording_active), daemon=True)
+        self.plot_timer = QTimer(self)
+        self.plot_timer.timeout.connect(self.update_plots)
+        self.plot_timer.start(1000 // TELEMETRY_RATE)
+
+        self.governor_timer = QTimer(self)
+        self.governor_timer.timeout.connect(self.update_display_governor)
+        self.governor_timer.start(500)
+
+        self.display_frames = metrics.counter("gui.display_frames")
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats_overlay)
+        if metrics.enabled:
+            self.stats_box.setChecked(True)
+
+        self.joystick_thread = Thread(target=self.Controller.run_joystick_control, args=(self.MetricsSystem, self.recording_active), daemon=True, name="gcs-control")
         self.joystick_thread.start()  
         
     def init_ui(self):
@@ -93,6 +140,23 @@ class SoftwareGCS(QWidget):
         left_layout.addWidget(takeoff_button)
         left_layout.addWidget(land_button)
 
+        photo_layout = QHBoxLayout()
+        photo_button = QPushButton("Photo")
+        photo_button.setStyleSheet("font-size: 20px; padding: 10px;")
+        photo_button.clicked.connect(self.take_photo)
+
+        burst_button = QPushButton("Burst")
+        burst_button.setStyleSheet("font-size: 20px; padding: 10px;")
+        burst_button.clicked.connect(self.take_burst)
+
+        self.raw_photo_box = QCheckBox("Full-res")
+        self.raw_photo_box.setStyleSheet("font-size: 20px;")
+
+        photo_layout.addWidget(photo_button)
+        photo_layout.addWidget(burst_button)
+        photo_layout.addWidget(self.raw_photo_box)
+        left_layout.addLayout(photo_layout)
+
         filter_group = self.create_filter_controls()
         left_layout.addWidget(filter_group)
 
@@ -125,7 +189,7 @@ class SoftwareGCS(QWidget):
         right_layout = QVBoxLayout()
         video_container = QStackedLayout()
 
-        self.video_label = QLabel("Video Stream")
+        self.video_label = VideoWidget("Video Stream")
         self.video_label.setAlignment(Qt.AlignCenter)
         self.video_label.setStyleSheet(
             "background-color: black; color: white; font-size: 18px;"
@@ -141,6 +205,7 @@ class SoftwareGCS(QWidget):
         self.roll_label = QLabel("Roll: --°")
         self.yaw_label = QLabel("Yaw: --°")
         self.flight_time_label = QLabel("Flight Time: --")
+        self.display_label = QLabel("Display: --")
 
         for label in [
             self.battery_label,
@@ -148,6 +213,7 @@ class SoftwareGCS(QWidget):
             self.roll_label,
             self.yaw_label,
             self.flight_time_label,
+            self.display_label,
         ]:
             label.setStyleSheet(
                 "font-size: 20px; padding: 5px; color: white; background-color: rgba(0, 0, 0, 0.5);"
@@ -155,6 +221,32 @@ class SoftwareGCS(QWidget):
             telemetry_layout.addWidget(label)
 
         right_layout.addLayout(telemetry_layout)
+
+        plots_layout = QHBoxLayout()
+        history = self.MetricsSystem.flight_recorder.history
+        self.altitude_plot = Sparkline("Altitude cm", history, ("h",))
+        self.battery_plot = Sparkline("Battery %", history, ("bat",), value_range=(0, 100))
+        self.attitude_plot = Sparkline("Attitude °", history, ("pitch", "roll"), value_range=(-90, 90))
+        self.plots = [self.altitude_plot, self.battery_plot, self.attitude_plot]
+        for plot in self.plots:
+            plot.setFixedHeight(80)
+            plots_layout.addWidget(plot)
+        right_layout.addLayout(plots_layout)
+
+        # Each label with the fields it shows; only labels whose fields
+        # changed are redrawn
+        self.telemetry_labels = [
+            (("templ", "temph"), self.temp_label, lambda s: f"Temperature: {format_value(s.temperature, '.1f')}°C"),
+            (("vgx", "vgy", "vgz"), self.speed_label, lambda s: f"Speed: {format_value(s.speed, '.1f')} cm/s"),
+            (("h",), self.altitude_label, lambda s: f"Altitude: {format_value(s.h)} cm"),
+            (("baro",), self.height_label, lambda s: f"Barometer: {format_value(s.baro, '.2f')} cm"),
+            (("bat",), self.battery_label, lambda s: f"Battery: {format_value(s.bat)}%"),
+            (("pitch",), self.pitch_label, lambda s: f"Pitch: {format_value(s.pitch)}°"),
+            (("roll",), self.roll_label, lambda s: f"Roll: {format_value(s.roll)}°"),
+            (("yaw",), self.yaw_label, lambda s: f"Yaw: {format_value(s.yaw)}°"),
+            (("time",), self.flight_time_label,
+             lambda s: f"Flight Time: {self.format_time(s.time if s.is_valid('time') else 0)}"),
+        ]
         main_layout.addLayout(right_layout, 14)
 
         self.setLayout(main_layout)
@@ -169,14 +261,35 @@ class SoftwareGCS(QWidget):
             "B&W": "bw",
             "Grayscale": "grayscale",
             "Invert": "invert",
+            "Contrast": "contrast",
+            "Gray+Contrast": "grayscale+contrast",
         }
 
         for i, (name, value) in enumerate(filters.items()):
             button = QPushButton(name)
             button.setStyleSheet("font-size: 20px; padding: 10px;")
-            button.clicked.connect(lambda _, v=value: self.CameraFilter.set_filter(v))
+            button.clicked.connect(lambda _, v=value: self.set_filter(v))
             filter_layout.addWidget(button, i // 2, i % 2)
 
+        # Trades filter fidelity for latency on expensive filters such as B&W
+        processing_label = QLabel("Quality:")
+        self.processing_box = QComboBox()
+        self.processing_box.setStyleSheet("font-size: 20px; padding: 5px;")
+        for name, preset in [("Full", "full"), ("Parallel", "parallel"), ("Balanced", "balanced"), ("Fast", "fast")]:
+            self.processing_box.addItem(name, preset)
+        self.processing_box.currentIndexChanged.connect(
+            lambda _: self.set_processing(self.processing_box.currentData())
+        )
+        row = (len(filters) + 1) // 2
+        filter_layout.addWidget(processing_label, row, 0)
+        filter_layout.addWidget(self.processing_box, row, 1)
+
+        # Enables instrumentation, draws it over the video and dumps it to
+        # drone_capture/log for later analysis
+        self.stats_box = QCheckBox("Stats overlay")
+        self.stats_box.toggled.connect(self.set_stats_enabled)
+        filter_layout.addWidget(self.stats_box, row + 1, 0, 1, 2)
+
         filter_group.setLayout(filter_layout)
         return filter_group
 
@@ -202,16 +315,52 @@ class SoftwareGCS(QWidget):
         metrics_group.setLayout(metrics_layout)
         return metrics_group
 
+    def set_filter(self, filter_type):
+        self.CameraFilter.set_filter(filter_type)
+        self.MetricsSystem.set_filter(filter_type)
+
+    def set_processing(self, preset):
+        self.CameraFilter.set_processing(preset)
+        self.MetricsSystem.set_processing(preset)
+
     def takeoff(self):
-        self.MetricsSystem.send_msg("takeoff")
-        self.log_callback("Takeoff initiated")
+        self.session_signals.send("takeoff")
+        self.Log.log_callback("Takeoff initiated")
 
     def land(self):
-        self.MetricsSystem.send_msg("land")
-        self.log_callback("Landing initiated")
+        self.session_signals.send("land")
+        self.Log.log_callback("Landing initiated")
+
+    def connect_drone(self):
+        if self.connect_thread is not None and self.connect_thread.is_alive():
+            return
+        self.connect_thread = Thread(target=self.session_signals.connect_session, daemon=True, name="gcs-connect")
+        self.connect_thread.start()
+
+    def drone_connected(self, connected):
+        if connected:
+            self.connect_failures = 0
+            self.Log.log_callback(f"Connected to {self.MetricsSystem.endpoints.label}")
+            return
+        # Keep trying until the drone is switched on or in range; only the
+        # first failure is logged so the log does not fill up meanwhile
+        if not self.connect_failures:
+            self.Log.log_callback("Could not connect to the drone or start its video, check the Wi-Fi connection. Retrying...")
+        self.connect_failures += 1
+        self.reconnect_timer.start(RECONNECT_INTERVAL_MS)
+
+    def log_command_result(self, future):
+        reply = future.result()
+        if future.latency is not None:
+            self.Log.log_callback(f"{future.command}: {reply} ({future.latency * 1000:.0f} ms)")
+        else:
+            self.Log.log_callback(f"{future.command}: {reply}")
 
     def take_photo(self):
-        self.MetricsSystem.take_photo()
+        self.MetricsSystem.take_photo(raw=self.raw_photo_box.isChecked())
+
+    def take_burst(self):
+        self.MetricsSystem.take_burst(raw=self.raw_photo_box.isChecked())
 
     def start_video(self):
         self.MetricsSystem.start_recording()
@@ -220,22 +369,47 @@ class SoftwareGCS(QWidget):
         self.MetricsSystem.stop_recording()
 
     def update_video_feed(self):
-        frame = self.MetricsSystem.get_current_frame()
-        if frame is not None:
-            frame = self.CameraFilter.apply_filter(frame)
-
-            frame = cv2.resize(frame, (self.video_label.width(), self.video_label.height()))
-            q_img = QImage(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB).data,
-                        frame.shape[1], frame.shape[0], QImage.Format_RGB888)
-
-            self.video_label.setPixmap(QPixmap.fromImage(q_img))
-
+        # Runs once per decoded frame; the widget repaints on Qt's next paint pass
+        if self.video_label.show_latest_frame():
+            self.display_frames.inc()
+            if not self.first_frame_shown:
+                self.first_frame_shown = True
+                startup.mark("first frame")
             if self.MetricsSystem.paused:
                 self.status_message.setText("Recording Paused")
                 self.status_message.setVisible(True)
             else:
                 self.status_message.setVisible(False)
 
+    def update_display_governor(self):
+        governor = self.MetricsSystem.display_governor
+        changed = governor.evaluate(
+            control_ms=self.Controller.tick_lateness_ms,
+            telemetry_ms=self.MetricsSystem.get_telemetry_latency(),
+        )
+        self.display_label.setText(f"Display: {governor.status()}")
+        self.display_label.setToolTip(governor.details())
+        if changed:
+            self.Log.log_callback(f"Display set to {governor.status()} ({governor.reason})")
+
+    def set_stats_enabled(self, enabled):
+        metrics.set_enabled(enabled)
+        if enabled:
+            date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+            dump_path = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), "drone_capture", "log", f"metrics_{date_str}.csv"
+            )
+            metrics.start_dump(dump_path)
+            self.stats_timer.start(500)
+            self.Log.log_callback(f"Metrics enabled, writing to {dump_path}")
+        else:
+            metrics.stop_dump()
+            self.stats_timer.stop()
+            self.video_label.set_overlay(None)
+
+    def update_stats_overlay(self):
+        self.video_label.set_overlay(format_snapshot(metrics.snapshot()))
+
     def pause_video(self):
         self.MetricsSystem.pause_recording()
         self.status_message.setText("Recording Paused")
@@ -251,44 +425,45 @@ class SoftwareGCS(QWidget):
         seconds = seconds % 60
         return f"{hours:02}:{minutes:02}:{seconds:02}"
 
-    def update_telemetry_metrics(self):
-        state = self.MetricsSystem.update_telemetry_metrics()
-        
-        flight_time_seconds = state.get('flight_time', 0)
-        formatted_flight_time = self.format_time(flight_time_seconds)
-        
-        self.temp_label.setText(f"Temperature: {state.get('temperature', '--')}°C")
-        self.speed_label.setText(f"Speed: {state.get('speed', '--')} cm/s")
-        self .altitude_label.setText(f"Altitude: {state.get('altitude', '--')} cm")
-        self.height_label.setText(f"Barometer: {state.get('barometer', '--')} cm")
-        self.battery_label.setText(f"Battery: {state.get('battery', '--')}%")
-        self.pitch_label.setText(f"Pitch: {state.get('pitch', '--')}°")
-        self.roll_label.setText(f"Roll: {state.get('roll', '--')}°")
-        self.yaw_label.setText(f"Yaw: {state.get('yaw', '--')}°")
-        self.flight_time_label.setText(f"Flight Time: {formatted_flight_time}")
-        
-        try:
-            battery_level = int(state.get('battery', 100)) 
-        except ValueError:
-            battery_level = 100
+    def update_plots(self):
+        for plot in self.plots:
+            plot.refresh()
+
+    def update_telemetry_metrics(self, signals):
+        state, changed = signals.take_telemetry()
+        if not self.first_telemetry_shown:
+            self.first_telemetry_shown = True
+            startup.mark("first telemetry")
+
+        for fields, label, text in self.telemetry_labels:
+            if not changed.isdisjoint(fields):
+                label.setText(text(state))
+
+        if "bat" not in changed:
+            return
+        battery_level = int(state.bat) if state.is_valid("bat") else 100
 
-        if battery_level <= 15 and battery_level <= self.last_battery_warning - 5:
+        if battery_level <= BATTERY_WARNING_LEVEL and battery_level <= self.last_battery_warning - 5:
             self.show_battery_warning(battery_level)
             self.last_battery_warning = battery_level
 
     def show_battery_warning(self, battery_level):
-        msg = QMessageBox()
-        msg.setIcon(QMessageBox.Warning)
-        msg.setWindowTitle("Low Battery Warning")
-        msg.setText(f"Battery level is critically low: {battery_level}%.\nPlease land immediately.")
-        msg.setStandardButtons(QMessageBox.Ok)
-        msg.exec()
+        # Drawn over the video instead of a modal box, which would stall the
+        # GUI thread and with it the video
+        self.Log.log_callback(f"Battery level is critically low: {battery_level}%")
+        self.video_label.set_alert(f"Battery {battery_level}%: land immediately")
+        self.alert_timer.start(BATTERY_ALERT_MS)
 
 if __name__ == "__main__":
-    MetricsSystem = MetricsSystem()
+    setup_logging()
+    with startup.span("session"):
+        MetricsSystem = MetricsSystem()
 
     app = QApplication(sys.argv)
-    app_ui = SoftwareGCS(MetricsSystem)
+    with startup.span("window built"):
+        app_ui = SoftwareGCS(MetricsSystem)
     app_ui.show()
+    # Runs once the event loop has processed the first show and paint
+    QTimer.singleShot(0, lambda: startup.mark("window shown"))
 
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,83 @@
+import os
+import sys
+import argparse
+import cv2
+import numpy as np
+
+from time import perf_counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from manager.CameraFilter import CameraFilter
+
+RESOLUTIONS = {
+    "720p": (1280, 720),
+    "480p": (640, 480),
+}
+
+MODES = [
+    ("full", {"preset": "full"}),
+    ("tiles=2", {"quality": 1.0, "tiles": 2}),
+    ("tiles=4", {"quality": 1.0, "tiles": 4}),
+    ("proxy 0.75", {"quality": 0.75, "tiles": 1}),
+    ("proxy 0.5", {"quality": 0.5, "tiles": 1}),
+    ("proxy 0.5 + tiles=2", {"quality": 0.5, "tiles": 2}),
+    ("roi centre 50%", {"quality": 1.0, "tiles": 1, "roi": (0.25, 0.25, 0.5, 0.5)}),
+]
+
+
+def synthetic_frame(width, height, seed=0):
+    # Smoothed noise plus a gradient gives the threshold something like real
+    # texture to work on
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(noise, (9, 9), 0)
+    gradient = np.linspace(0, 80, width, dtype=np.float32)[None, :, None]
+    return np.clip(frame + gradient, 0, 255).astype(np.uint8)
+
+
+def time_filter(camera_filter, frame, iterations):
+    for _ in range(5):
+        camera_filter.apply_filter(frame)
+    samples = []
+    for _ in range(iterations):
+        start = perf_counter()
+        camera_filter.apply_filter(frame)
+        samples.append(perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+def run(filter_name="bw", iterations=100):
+    print(f"Filter: {filter_name}, {iterations} iterations, median ms per frame")
+    for label, (width, height) in RESOLUTIONS.items():
+        frame = synthetic_frame(width, height)
+        camera_filter = CameraFilter()
+        camera_filter.set_filter(filter_name)
+
+        camera_filter.set_processing("full")
+        reference = camera_filter.apply_filter(frame).copy()
+        baseline = None
+
+        print(f"\n{label} ({width}x{height})")
+        print(f"{'mode':<22}{'ms':>8}{'speedup':>9}{'match':>8}")
+        for mode, options in MODES:
+            camera_filter.set_processing(**options)
+            elapsed = time_filter(camera_filter, frame, iterations)
+            if baseline is None:
+                baseline = elapsed
+            # Pixels agreeing with the full-resolution result; meaningless for
+            # ROI mode, which deliberately leaves the rest of the frame alone
+            if "roi" in options:
+                match = "-"
+            else:
+                match = f"{(camera_filter.apply_filter(frame) == reference).mean() * 100:.1f}%"
+            print(f"{mode:<22}{elapsed:>8.2f}{baseline / elapsed:>8.2f}x{match:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CameraFilter processing modes")
+    parser.add_argument("--filter", default="bw")
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+    run(args.filter, args.iterations)
@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+import numpy as np
+
+from threading import Thread
+from time import sleep, perf_counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from manager.MetricsSystem import MetricsSystem
+from manager.Controller import Controller
+from manager.CameraFilter import CameraFilter
+from manager.DroneSimulator import DroneSimulator
+from manager.VirtualJoystick import VirtualJoystick
+from manager.DroneSession import DroneEndpoints
+from manager.Recorder import ffmpeg_available, PASSTHROUGH, REENCODE
+from FilterBenchmark import synthetic_frame, time_filter
+
+# Metrics where a larger value is a regression; everything else reported is
+# a rate where a smaller value is
+LOWER_IS_BETTER = ("_ms", "_loss")
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return None, None
+    last = len(samples) - 1
+    return samples[last // 2], samples[last * 95 // 100]
+
+
+def bench_commands(system, count, interval=0.05):
+    # Paced like a pilot rather than flooded, so the command rate limit
+    # does not show up as latency
+    samples = []
+    for _ in range(count):
+        start = perf_counter()
+        reply = system.send_msg("command")
+        if reply == "ok":
+            samples.append((perf_counter() - start) * 1000)
+        sleep(interval)
+    p50, p95 = percentiles(samples)
+    return {
+        "command_rtt_p50_ms": p50,
+        "command_rtt_p95_ms": p95,
+        "command_loss": 1 - len(samples) / count,
+    }
+
+
+def bench_telemetry(system, simulator, seconds):
+    start_seq = system.telemetry.seq
+    start_sent = simulator.states_sent
+    sleep(seconds)
+    received = system.telemetry.seq - start_seq
+    sent = simulator.states_sent - start_sent
+    return {
+        "telemetry_rate": received / seconds,
+        "telemetry_loss": 1 - received / sent if sent else None,
+    }
+
+
+def bench_control(system, simulator, seconds, control_rate=30):
+    joystick = VirtualJoystick()
+    controller = Controller(control_rate=control_rate, joystick=joystick)
+    thread = Thread(target=controller.run_joystick_control, args=(system, [False]), daemon=True)
+    start_packets = simulator.rc_packets
+    thread.start()
+    # Sweep a stick so every packet differs, like a pilot would
+    end = perf_counter() + seconds
+    while perf_counter() < end:
+        joystick.set_axis(0, np.sin(perf_counter() * 3))
+        sleep(0.01)
+    controller.stop()
+    thread.join(timeout=2)
+    return {
+        "rc_rate": (simulator.rc_packets - start_packets) / seconds,
+        "rc_tick_late_ms": controller.tick_lateness_ms,
+    }
+
+
+def bench_filter(iterations):
+    frame = synthetic_frame(960, 720)
+    camera_filter = CameraFilter()
+    results = {}
+    for name in ("bw", "grayscale+contrast", "invert"):
+        camera_filter.set_filter(name)
+        results[f"filter_{name}_ms"] = time_filter(camera_filter, frame, iterations)
+    return results
+
+
+def bench_video(system, simulator, seconds, label="video"):
+    latencies = []
+
+    def on_frame(frame):
+        latency = simulator.frame_latency(frame.image)
+        if latency is not None:
+            latencies.append(latency * 1000)
+
+    system.frame_processor.subscribe(on_frame)
+    start_frames = system.frame_processor.seq
+    sleep(seconds)
+    system.frame_processor.unsubscribe(on_frame)
+    p50, p95 = percentiles(latencies)
+    results = {
+        f"{label}_fps": (system.frame_processor.seq - start_frames) / seconds,
+        f"{label}_latency_p50_ms": p50,
+        f"{label}_latency_p95_ms": p95,
+    }
+    stats = system.get_video_stats()
+    if stats is not None and stats["frames"]:
+        results[f"{label}_ingest_p50_ms"] = stats["latency_p50_ms"]
+        results[f"{label}_picture_loss"] = (stats["lost"] + stats["decode_errors"]) / stats["frames"]
+    return results
+
+
+def bench_recording(system, simulator, seconds, mode):
+    system.recording_mode = mode
+    system.start_recording()
+    try:
+        return bench_video(system, simulator, seconds, f"record_{mode}")
+    finally:
+        system.stop_recording()
+        system.wait_for_recording(timeout=10)
+        if system.video_path and os.path.exists(system.video_path):
+            shutil.rmtree(system.video_path)
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, value in results.items():
+        previous = baseline.get(name)
+        if value is None or previous is None or previous == 0:
+            continue
+        if name.endswith(LOWER_IS_BETTER):
+            worse = value > previous * (1 + tolerance)
+        else:
+            worse = value < previous * (1 - tolerance)
+        if worse:
+            regressions.append(f"{name}: {previous:.3f} -> {value:.3f}")
+    return regressions
+
+
+def run(args):
+    simulator = DroneSimulator(
+        latency=args.latency, jitter=args.jitter, loss=args.loss, state_rate=args.state_rate,
+        action_scale=0.01,
+    )
+    results = {}
+    # Flight logs of benchmark runs are not kept
+    with simulator, tempfile.TemporaryDirectory() as log_dir:
+        system = MetricsSystem(DroneEndpoints(simulator.host, simulator.command_port), log_dir=log_dir)
+        if not system.init_sdk_mode():
+            raise SystemExit("Simulator did not answer")
+        system.start_telemetry()
+
+        results.update(bench_commands(system, args.commands))
+        results.update(bench_telemetry(system, simulator, args.seconds))
+        results.update(bench_control(system, simulator, args.seconds))
+        results.update(bench_filter(args.iterations))
+
+        if ffmpeg_available():
+            system.start_video_stream()
+            sleep(2)
+            results.update(bench_video(system, simulator, args.seconds))
+            for mode in (PASSTHROUGH, REENCODE):
+                results.update(bench_recording(system, simulator, args.seconds, mode))
+        else:
+            print("ffmpeg not found, skipping video and recording benchmarks")
+
+        system.video_stream_active = False
+        system.stream_relay.stop()
+        system.photo_capture.shutdown()
+        system.stop_telemetry()
+        system.flight_recorder.close()
+        system.command_channel.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the GCS against a simulated drone")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--state-rate", type=float, default=100.0)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args)
+    for name, value in results.items():
+        print(f"{name:<34}{'-' if value is None else f'{value:.3f}':>12}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
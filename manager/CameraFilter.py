@@ -1,22 +1,264 @@
-import cv2
+import os
+import threading
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from manager.Instrumentation import metrics
+from manager.OpenCVLoader import load_opencv
+
+BLOCK_SIZE = 11
+THRESHOLD_C = 2
+
+# Quality/latency knob for expensive filters: quality below 1 runs them on a
+# downscaled proxy, tiles above 1 splits the frame across the tile pool
+PROCESSING_PRESETS = {
+    "full": {"quality": 1.0, "tiles": 1},
+    "parallel": {"quality": 1.0, "tiles": 4},
+    "balanced": {"quality": 0.75, "tiles": 2},
+    "fast": {"quality": 0.5, "tiles": 1},
+}
+
+tile_pool = None
+
+
+def get_tile_pool():
+    global tile_pool
+    if tile_pool is None:
+        tile_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="filter-tile")
+    return tile_pool
+
+
+def invert_table():
+    return (255 - np.arange(256)).astype(np.uint8)
+
+
+def contrast_table(gain):
+    values = (np.arange(256, dtype=np.float32) - 128.0) * gain + 128.0
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+
+class GrayStage:
+    name = "grayscale"
+
+    def output_shape(self, shape):
+        return shape[:2]
+
+    def run(self, src, dst):
+        cv = load_opencv()
+        return cv.cvtColor(src, cv.COLOR_BGR2GRAY, dst=dst)
+
+
+class ColorStage:
+    name = "to_bgr"
+
+    def output_shape(self, shape):
+        return shape[:2] + (3,)
+
+    def run(self, src, dst):
+        # Gray results are expanded back to BGR, which is what the rest of
+        # the pipeline expects
+        cv = load_opencv()
+        return cv.cvtColor(src, cv.COLOR_GRAY2BGR, dst=dst)
+
+
+class ProcessingOptions:
+    def __init__(self, quality=1.0, tiles=1, roi=None):
+        self.quality = min(1.0, max(0.1, quality))
+        self.tiles = max(1, int(tiles))
+        # (x, y, width, height) as fractions of the frame
+        self.roi = roi
+
+
+class ThresholdStage:
+    name = "bw"
+
+    def __init__(self, processing=None):
+        self.processing = processing or ProcessingOptions()
+
+    def output_shape(self, shape):
+        return shape
+
+    def run(self, src, dst):
+        roi = self.processing.roi
+        if roi is None:
+            self.threshold(src, dst)
+            return dst
+
+        # Outside the region of interest the frame is left plain grayscale
+        height, width = src.shape
+        x0 = int(roi[0] * width)
+        y0 = int(roi[1] * height)
+        x1 = min(width, x0 + max(1, int(roi[2] * width)))
+        y1 = min(height, y0 + max(1, int(roi[3] * height)))
+        np.copyto(dst, src)
+        region = np.ascontiguousarray(src[y0:y1, x0:x1])
+        out = np.empty_like(region)
+        self.threshold(region, out)
+        dst[y0:y1, x0:x1] = out
+        return dst
+
+    def threshold(self, src, dst):
+        cv = load_opencv()
+        quality = self.processing.quality
+        if quality >= 1.0:
+            self.tiled(src, dst, BLOCK_SIZE)
+            return
+
+        height, width = src.shape
+        size = (max(1, int(width * quality)), max(1, int(height * quality)))
+        # INTER_AREA is only cheap for an exact 2x reduction
+        interpolation = cv.INTER_AREA if quality == 0.5 else cv.INTER_LINEAR
+        proxy = cv.resize(src, size, interpolation=interpolation)
+        # Shrink the neighbourhood with the image so the look stays similar
+        block = max(3, int(BLOCK_SIZE * quality) | 1)
+        result = np.empty_like(proxy)
+        self.tiled(proxy, result, block)
+        cv.resize(result, (width, height), dst=dst, interpolation=cv.INTER_NEAREST)
+
+    def tiled(self, src, dst, block):
+        cv = load_opencv()
+        tiles = self.processing.tiles
+        height = src.shape[0]
+        if tiles == 1 or height < tiles * block:
+            cv.adaptiveThreshold(
+                src, 255, cv.ADAPTIVE_THRESH_GAUSSIAN_C, cv.THRESH_BINARY, block, THRESHOLD_C, dst=dst
+            )
+            return
+
+        # Bands overlap by the filter radius, so every output row sees the
+        # same neighbourhood as in a full-frame pass and the result is
+        # identical. OpenCV drops the GIL, so the bands really run in parallel.
+        halo = block // 2
+
+        def run_band(start, end):
+            top = max(0, start - halo)
+            bottom = min(height, end + halo)
+            band = cv.adaptiveThreshold(
+                src[top:bottom], 255, cv.ADAPTIVE_THRESH_GAUSSIAN_C, cv.THRESH_BINARY, block, THRESHOLD_C
+            )
+            dst[start:end] = band[start - top:end - top]
+
+        bounds = [height * i // tiles for i in range(tiles + 1)]
+        pool = get_tile_pool()
+        futures = [pool.submit(run_band, start, end) for start, end in zip(bounds, bounds[1:])]
+        for future in futures:
+            future.result()
+
+
+class LutStage:
+    def __init__(self, name, table):
+        self.name = name
+        self.table = table
+
+    def output_shape(self, shape):
+        return shape
+
+    def run(self, src, dst):
+        return load_opencv().LUT(src, self.table, dst=dst)
+
+    def then(self, other):
+        # Two point-wise maps collapse into one table, i.e. one pass over the frame
+        return LutStage(f"{self.name}+{other.name}", other.table[self.table])
+
+
+class FilterProgram:
+    def __init__(self, stages):
+        self.stages = tuple(stages)
+
 
 class CameraFilter:
-    def __init__(self):
-        self.current_filter = "normal"  
+    def __init__(self, contrast=1.5):
+        self.current_filter = "normal"
+        self.luts = {
+            "invert": invert_table(),
+            "contrast": contrast_table(contrast),
+        }
+        self.chain = []
+        self.processing = ProcessingOptions()
+        self.program = FilterProgram(())
+        # Each thread (display, recorder, photo) gets its own output buffers
+        self.local = threading.local()
+        self.timings = {}
 
     def set_filter(self, filter_type):
-        self.current_filter = filter_type
-        
-    def apply_filter(self, frame):
-        if self.current_filter == "normal":
+        # Accepts a single filter or a chain such as "grayscale+contrast+invert"
+        if isinstance(filter_type, str):
+            chain = [name.strip() for name in filter_type.split("+") if name.strip()]
+        else:
+            chain = list(filter_type)
+        self.program = self.compile(chain)
+        self.chain = chain
+        self.current_filter = "+".join(chain) or "normal"
+
+    def set_processing(self, preset=None, quality=None, tiles=None, roi=None):
+        options = dict(PROCESSING_PRESETS[preset]) if preset else {
+            "quality": self.processing.quality,
+            "tiles": self.processing.tiles,
+        }
+        if quality is not None:
+            options["quality"] = quality
+        if tiles is not None:
+            options["tiles"] = tiles
+        self.processing = ProcessingOptions(roi=roi, **options)
+        self.program = self.compile(self.chain)
+
+    def compile(self, chain):
+        stages = []
+        gray = False
+        for name in chain:
+            if name == "normal":
+                continue
+            elif name in ("grayscale", "bw"):
+                if not gray:
+                    stages.append(GrayStage())
+                    gray = True
+                if name == "bw":
+                    stages.append(ThresholdStage(self.processing))
+            elif name in self.luts:
+                stage = LutStage(name, self.luts[name])
+                if stages and isinstance(stages[-1], LutStage):
+                    stage = stages.pop().then(stage)
+                stages.append(stage)
+            else:
+                raise ValueError(f"Unknown filter: {name}")
+        if gray:
+            stages.append(ColorStage())
+        return FilterProgram(stages)
+
+    def buffers_for(self, program, shape):
+        local = self.local
+        if getattr(local, "key", None) != (program, shape):
+            buffers = []
+            stage_shape = shape
+            for stage in program.stages:
+                stage_shape = stage.output_shape(stage_shape)
+                buffers.append(np.empty(stage_shape, dtype=np.uint8))
+            local.key = (program, shape)
+            local.buffers = buffers
+        return local.buffers
+
+    def apply_filter(self, frame, out=None):
+        # Without out the result lives in a per-thread buffer that is reused
+        # on the next call from the same thread; pass out if it must outlive that
+        program = self.program
+        if not program.stages:
             return frame
-        elif self.current_filter == "bw":
-            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            frame = cv2.adaptiveThreshold(gray_frame, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-            return cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
-        elif self.current_filter == "grayscale":
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            return cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
-        elif self.current_filter == "invert":
-            frame = cv2.bitwise_not(frame)
-            return frame
\ No newline at end of file
+
+        buffers = self.buffers_for(program, frame.shape)
+        if out is not None:
+            buffers = buffers[:-1] + [out]
+        timings = self.timings
+        for stage, buffer in zip(program.stages, buffers):
+            start = perf_counter()
+            frame = stage.run(frame, buffer)
+            elapsed = (perf_counter() - start) * 1000
+            previous = timings.get(stage.name)
+            timings[stage.name] = elapsed if previous is None else previous * 0.9 + elapsed * 0.1
+            if metrics.enabled:
+                metrics.histogram("filter." + stage.name).observe(elapsed)
+        return frame
+
+    def get_timings(self):
+        return dict(self.timings)
@@ -0,0 +1,288 @@
+import logging
+
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from threading import Lock
+from time import monotonic
+
+from manager.Instrumentation import metrics
+from manager.NetworkHub import get_default_hub
+
+DEFAULT_TIMEOUT = 3.0
+MAX_PENDING = 32
+
+# Safe to send twice if the reply was lost: queries and settings. Anything
+# that moves the drone is never retried.
+RETRYABLE = ("command", "streamon", "streamoff", "speed", "port", "wifi", "mon", "moff")
+
+logger = logging.getLogger(__name__)
+
+# Commands the drone only acknowledges once the manoeuvre has finished
+COMMAND_TIMEOUTS = {
+    "takeoff": 20.0,
+    "land": 20.0,
+    "flip": 10.0,
+    "up": 10.0,
+    "down": 10.0,
+    "left": 10.0,
+    "right": 10.0,
+    "forward": 10.0,
+    "back": 10.0,
+    "cw": 10.0,
+    "ccw": 10.0,
+}
+
+
+class CommandFuture(Future):
+    def __init__(self, command, seq, timeout):
+        super().__init__()
+        self.command = command
+        self.seq = seq
+        self.timeout = timeout
+        self.sent_at = None
+        self.deadline = None
+        self.latency = None
+        self.attempts = 0
+
+
+class CommandChannel:
+    # Replies arrive through the shared NetworkHub, routed by the drone's
+    # address, so a channel costs no threads of its own
+    def __init__(self, addr, local_port=9000, default_timeout=DEFAULT_TIMEOUT, latency_callback=None, hub=None,
+                 retries=2, max_pending=MAX_PENDING):
+        self.addr = addr
+        self.default_timeout = default_timeout
+        self.retries = retries
+        self.max_pending = max_pending
+        self.latency_callback = latency_callback
+        self.timeout_counter = metrics.counter("command.timeouts")
+
+        self.hub = hub or get_default_hub()
+        self.local_port = self.hub.open(local_port)
+        self.hub.register(self.local_port, addr[0], self.on_datagram)
+
+        self.pending = deque()
+        self.in_flight = None
+        self.timer = None
+        # Expiry times of attempts that were never answered; the drone may
+        # still reply to them, after the next command has gone out
+        self.stray = deque()
+        self.pending_lock = Lock()
+        self.seq = 0
+        self.seq_lock = Lock()
+
+        self.latencies = deque(maxlen=200)
+        self.timeouts = 0
+        self.retried = 0
+        self.rejected = 0
+        self.late_replies = 0
+
+        self.running = True
+
+    def next_seq(self):
+        with self.seq_lock:
+            self.seq += 1
+            return self.seq
+
+    def timeout_for(self, command):
+        return COMMAND_TIMEOUTS.get(command.split(" ", 1)[0], self.default_timeout)
+
+    def retries_for(self, command):
+        name = command.split(" ", 1)[0]
+        return self.retries if name.endswith("?") or name in RETRYABLE else 0
+
+    def create(self, command, timeout=None):
+        return CommandFuture(command, self.next_seq(), timeout or self.timeout_for(command))
+
+    def send_async(self, command, timeout=None, callback=None):
+        # callback runs on the network thread and must not block
+        future = self.create(command, timeout)
+        if callback:
+            future.add_done_callback(callback)
+        return self.submit(future)
+
+    def submit(self, future):
+        if not self.running:
+            self.resolve(future, "error")
+            return future
+        with self.pending_lock:
+            # Backpressure: a caller flooding a slow or silent drone gets
+            # "busy" instead of an ever-growing queue
+            busy = len(self.pending) >= self.max_pending
+            if not busy:
+                self.pending.append(future)
+        if busy:
+            self.rejected += 1
+            self.resolve(future, "busy")
+            return future
+        self.dispatch_next()
+        return future
+
+    @property
+    def idle(self):
+        return self.in_flight is None and not self.pending
+
+    def send_nowait(self, command):
+        # RC-style commands get no reply from the drone, so nothing is tracked;
+        # under socket backpressure they are dropped, the next one supersedes them
+        if self.running:
+            self.hub.sendto(self.local_port, command.encode(), self.addr, droppable=True)
+
+    def send(self, command, timeout=None):
+        queued = self.remaining() + len(self.pending) * self.default_timeout
+        future = self.send_async(command, timeout)
+        return self.wait(future, queued)
+
+    def remaining(self):
+        # Longest the command on the wire can still take, retries included
+        future = self.in_flight
+        if future is None or future.deadline is None:
+            return 0.0
+        attempts_left = self.retries_for(future.command) + 1 - future.attempts
+        return max(0.0, future.deadline - monotonic()) + attempts_left * future.timeout
+
+    def wait(self, future, queued=0.0):
+        # The hub resolves the future once every attempt has timed out; the
+        # extra second only guards against the network thread having died
+        attempts = self.retries_for(future.command) + 1
+        try:
+            return future.result(future.timeout * attempts + queued + 1.0)
+        except FutureTimeout:
+            # Never put it on the wire once the caller has given up
+            future.cancel()
+            return "timeout"
+        except Exception:
+            return "error"
+
+    def dispatch_next(self):
+        # The drone executes one command at a time and its replies carry no
+        # command id, so only one acknowledged command is kept on the wire.
+        # Callers never wait for this; their commands queue up behind it in
+        # sequence order while fire-and-forget traffic keeps flowing.
+        with self.pending_lock:
+            if self.in_flight is not None:
+                return
+            while self.pending:
+                future = self.pending.popleft()
+                # Callers may cancel a command until it is put on the wire
+                if future.set_running_or_notify_cancel():
+                    break
+            else:
+                return
+            self.in_flight = future
+        self.transmit(future)
+
+    def transmit(self, future):
+        future.attempts += 1
+        future.sent_at = monotonic()
+        future.deadline = future.sent_at + future.timeout
+        timer = self.hub.call_later(future.timeout, lambda: self.expire(future))
+        with self.pending_lock:
+            self.timer = timer
+        if not self.sendto(future.command):
+            self.complete(future, "error")
+
+    def sendto(self, command):
+        return self.hub.sendto(self.local_port, command.encode(), self.addr)
+
+    def on_datagram(self, data, addr):
+        self.match_reply(data.decode(errors="replace").strip())
+
+    def match_reply(self, reply):
+        # Replies carry no command id: one owed to an earlier attempt must not
+        # complete the command now on the wire
+        with self.pending_lock:
+            now = monotonic()
+            while self.stray and self.stray[0] <= now:
+                self.stray.popleft()
+            stray = bool(self.stray)
+            if stray:
+                self.stray.popleft()
+        future = self.in_flight
+        if future is None or stray:
+            # Usually the answer to a command that already timed out
+            self.late_replies += 1
+            return
+
+        future.latency = monotonic() - future.sent_at
+        self.latencies.append(future.latency)
+        if self.latency_callback:
+            self.latency_callback(future.command, future.latency)
+        self.complete(future, reply)
+
+    def expire(self, future):
+        # Every timeout and retry decision for the channel is made here
+        if self.in_flight is not future:
+            return
+        if future.attempts <= self.retries_for(future.command) and self.running:
+            self.retried += 1
+            logger.info(f"No reply to {future.command}, retrying")
+            self.transmit(future)
+            return
+        self.timeouts += 1
+        self.timeout_counter.inc()
+        logger.warning(f"Command timed out: {future.command}")
+        self.complete(future, "timeout", answered=False)
+
+    def complete(self, future, reply, answered=True):
+        with self.pending_lock:
+            if self.in_flight is not future:
+                return
+            self.in_flight = None
+            # Late answers are only expected for a while; a reply the drone
+            # never sent must not hold back the ones after it for good
+            unanswered = future.attempts - 1 if answered else future.attempts
+            self.stray.extend([monotonic() + self.default_timeout] * unanswered)
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        self.resolve(future, reply)
+        self.dispatch_next()
+
+    def fail_pending(self):
+        with self.pending_lock:
+            pending = list(self.pending)
+            self.pending.clear()
+            if self.in_flight is not None:
+                pending.append(self.in_flight)
+                self.in_flight = None
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        for future in pending:
+            self.resolve(future, "error")
+
+    @staticmethod
+    def resolve(future, reply):
+        if not future.done():
+            try:
+                future.set_result(reply)
+            except Exception:
+                pass
+
+    def get_latency_stats(self):
+        samples = sorted(self.latencies)
+        stats = {
+            "count": len(samples),
+            "queued": len(self.pending),
+            "timeouts": self.timeouts,
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "late_replies": self.late_replies,
+        }
+        if samples:
+            stats.update({
+                "last_ms": self.latencies[-1] * 1000,
+                "min_ms": samples[0] * 1000,
+                "median_ms": samples[len(samples) // 2] * 1000,
+                "max_ms": samples[-1] * 1000,
+            })
+        return stats
+
+    def close(self):
+        if not self.running:
+            return
+        self.running = False
+        self.hub.unregister(self.local_port, self.addr[0])
+        self.hub.close(self.local_port)
+        self.fail_pending()
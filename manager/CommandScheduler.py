@@ -0,0 +1,255 @@
+import heapq
+import logging
+
+from concurrent.futures import TimeoutError as FutureTimeout
+from threading import Lock
+from time import monotonic
+
+from manager.Instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+SAFETY = 0
+CONTROL = 1
+MOVEMENT = 2
+
+# Commands that must reach the drone ahead of anything already queued
+SAFETY_COMMANDS = ("emergency", "land", "stop")
+# Manoeuvres only; settings such as speed are CONTROL and survive a land
+MOVEMENT_COMMANDS = ("up", "down", "left", "right", "forward", "back", "cw", "ccw", "go", "curve", "jump", "flip")
+# A newer one of these makes any queued one pointless
+SUPERSEDED_COMMANDS = ("speed",)
+
+# What the Tello keeps up with: rc at the controller's highest rate, with a
+# little room for acknowledged commands in between
+DEFAULT_RATE = 50.0
+DEFAULT_BURST = 5
+
+
+def command_priority(command):
+    name = command.split(" ", 1)[0]
+    if name in SAFETY_COMMANDS:
+        return SAFETY
+    if name in MOVEMENT_COMMANDS:
+        return MOVEMENT
+    return CONTROL
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now):
+        # Seconds until a token is available; 0 if one was taken
+        self.refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def force(self, now):
+        # Safety commands are never held back, but still use up a token
+        self.refill(now)
+        self.tokens -= 1.0
+
+
+class CommandScheduler:
+    # Sits in front of a CommandChannel and decides what goes out next.
+    # Acknowledged commands wait in a priority queue: land and emergency
+    # go before anything queued, movement after everything else. rc
+    # packets keep only the newest one, and a newer speed replaces a queued
+    # one. A token bucket keeps the total rate to what the drone handles;
+    # when rc and an acknowledged command both wait for a token they take
+    # turns, so rc at the full control rate cannot starve commands. All
+    # sending happens on the network thread.
+    def __init__(self, channel, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_queued=32):
+        self.channel = channel
+        self.hub = channel.hub
+        self.bucket = TokenBucket(rate, burst)
+        self.max_queued = max_queued
+        self.queue = []
+        self.rc = None
+        self.pump_scheduled = False
+        # Whether the last token went to rc, for taking turns
+        self.rc_last = False
+        self.lock = Lock()
+
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.limited = 0
+
+        self.queue_depth = metrics.gauge("command.queue_depth")
+        self.coalesced_counter = metrics.counter("command.coalesced")
+        self.dropped_counter = metrics.counter("command.dropped")
+        self.limited_counter = metrics.counter("command.rate_limited")
+
+    def send_async(self, command, timeout=None, callback=None):
+        # callback runs on the network thread and must not block
+        future = self.channel.create(command, timeout)
+        if callback:
+            future.add_done_callback(callback)
+        priority = command_priority(command)
+        name = command.split(" ", 1)[0]
+
+        if name == "emergency":
+            # Stops the motors whatever the drone is busy with; its reply
+            # could not be told apart from the one in flight
+            self.channel.sendto(command)
+            with self.lock:
+                self.bucket.force(monotonic())
+            self.sent += 1
+            self.channel.resolve(future, "sent")
+            self.drop_queued(MOVEMENT)
+            return future
+
+        superseded = None
+        full = False
+        with self.lock:
+            if name in SUPERSEDED_COMMANDS:
+                for index, (_, _, queued) in enumerate(self.queue):
+                    if queued.command.split(" ", 1)[0] == name:
+                        superseded = queued
+                        self.queue[index] = (priority, future.seq, future)
+                        heapq.heapify(self.queue)
+                        break
+            if superseded is None:
+                full = len(self.queue) >= self.max_queued and priority != SAFETY
+                if not full:
+                    heapq.heappush(self.queue, (priority, future.seq, future))
+            self.queue_depth.set(len(self.queue))
+        if full:
+            # Backpressure on the caller rather than an ever-growing queue
+            self.rejected += 1
+            self.channel.resolve(future, "busy")
+            return future
+        if superseded is not None:
+            self.coalesced += 1
+            self.coalesced_counter.inc()
+            self.channel.resolve(superseded, "superseded")
+        if priority == SAFETY:
+            # Moves queued before a land would only run after it
+            self.drop_queued(MOVEMENT)
+        self.schedule()
+        return future
+
+    def send(self, command, timeout=None):
+        future = self.send_async(command, timeout)
+        channel = self.channel
+        # Allow for the command on the wire, the queue ahead and its own attempts
+        attempts = channel.retries_for(command) + 1
+        budget = channel.remaining() + len(self.queue) * channel.default_timeout + future.timeout * attempts
+        try:
+            return future.result(budget + 1.0)
+        except FutureTimeout:
+            pass
+        if self.withdraw(future):
+            # Still queued: it never reaches the drone after the caller gave up
+            return "timeout"
+        # Already on the wire; its own deadline decides
+        return channel.wait(future)
+
+    def send_nowait(self, command):
+        # Only the newest rc packet matters; an older one still waiting for
+        # a token is replaced rather than sent late
+        with self.lock:
+            if self.rc is not None:
+                self.coalesced += 1
+                self.coalesced_counter.inc()
+            self.rc = command
+        self.schedule()
+
+    def withdraw(self, future):
+        with self.lock:
+            for index, entry in enumerate(self.queue):
+                if entry[2] is future:
+                    self.queue.pop(index)
+                    heapq.heapify(self.queue)
+                    break
+            else:
+                return False
+            self.queue_depth.set(len(self.queue))
+        self.channel.resolve(future, "timeout")
+        return True
+
+    def drop_queued(self, priority):
+        with self.lock:
+            dropped = [entry[2] for entry in self.queue if entry[0] == priority]
+            if dropped:
+                self.queue = [entry for entry in self.queue if entry[0] != priority]
+                heapq.heapify(self.queue)
+            self.queue_depth.set(len(self.queue))
+        for future in dropped:
+            self.dropped += 1
+            self.dropped_counter.inc()
+            self.channel.resolve(future, "dropped")
+
+    def schedule(self, delay=0.0):
+        with self.lock:
+            if self.pump_scheduled:
+                return
+            self.pump_scheduled = True
+        self.hub.call_later(delay, self.pump)
+
+    def pump(self):
+        # Network thread only
+        with self.lock:
+            self.pump_scheduled = False
+        now = monotonic()
+        while True:
+            with self.lock:
+                future = None
+                rc = None
+                wait = 0.0
+                ready = self.queue and self.channel.idle
+                if ready and self.queue[0][0] == SAFETY:
+                    self.bucket.force(now)
+                    future = heapq.heappop(self.queue)[2]
+                elif self.rc is not None or ready:
+                    wait = self.bucket.take(now)
+                    if not wait:
+                        if self.rc is not None and not (ready and self.rc_last):
+                            rc, self.rc = self.rc, None
+                            self.rc_last = True
+                        else:
+                            future = heapq.heappop(self.queue)[2]
+                            self.rc_last = False
+                self.queue_depth.set(len(self.queue))
+
+            if rc is not None:
+                self.channel.send_nowait(rc)
+            elif future is not None:
+                if future.done():
+                    continue
+                future.add_done_callback(self.on_done)
+                self.channel.submit(future)
+            elif wait:
+                self.limited += 1
+                self.limited_counter.inc()
+                self.schedule(wait)
+                return
+            else:
+                return
+            self.sent += 1
+
+    def on_done(self, future):
+        # The drone is free for the next acknowledged command
+        self.schedule()
+
+    def stats(self):
+        return {
+            "queued": len(self.queue),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "rate_limited": self.limited,
+        }
@@ -1,35 +1,70 @@
-import pygame
+import logging
 
+from contextlib import nullcontext
+from functools import partial
 from typing import List
 from PySide6.QtGui import (
     QTextCursor,
 )
-from time import sleep
+from time import sleep, monotonic
 
-class Controller:
-    def __init__(self):
-        pygame.init()
-        pygame.joystick.init()
+from manager.RCControl import RCControl
+from manager.JoystickInput import JoystickInput, find_joystick
+from manager.Instrumentation import metrics
+from manager.StartupProfile import startup
 
-        if pygame.joystick.get_count() == 0:
-            print("No joystick found")
-            raise SystemExit("No joystick found")
+MIN_CONTROL_RATE = 20
+MAX_CONTROL_RATE = 50
+# How often the control loop looks for a joystick while none is attached
+JOYSTICK_SCAN_INTERVAL = 1.0
 
-        self.joystick = pygame.joystick.Joystick(0)
-        self.joystick.init()
-        
-        self.num_axes = self.joystick.get_numaxes()
-        self.num_buttons = self.joystick.get_numbuttons()
+logger = logging.getLogger(__name__)
 
-        print(f"Joystick name: {self.joystick.get_name()}")
+class Controller:
+    def __init__(self, control_rate=30, rc_control=None, joystick=None):
+        # Without a joystick the control loop finds one itself, on its own
+        # thread, and picks it up again after it is unplugged and replugged
+        self.joystick = None
+        self.input = None
+        self.next_scan = 0.0
+        self.scanned = False
+
+        self.control_rate = max(MIN_CONTROL_RATE, min(MAX_CONTROL_RATE, control_rate))
+        self.rc = rc_control or RCControl()
+        self.last_speed = None
+        self.displayed_seq = None
+        # Smoothed ms by which control ticks start late, a proxy for how much
+        # the rest of the process is delaying rc packets
+        self.tick_lateness_ms = 0.0
+        self.running = False
+
+        if joystick is not None:
+            self.attach(joystick)
+
+    def attach(self, joystick):
+        # Anything with the pygame Joystick interface works, e.g. VirtualJoystick
+        joystick.init()
+        self.joystick = joystick
+        self.input = JoystickInput(joystick)
+        logger.info(f"Joystick name: {joystick.get_name()}")
+
+    def detach(self):
+        self.joystick = None
+        self.input = None
+
+    @property
+    def num_axes(self):
+        return self.input.num_axes if self.input else 0
+
+    @property
+    def num_buttons(self):
+        return self.input.num_buttons if self.input else 0
 
     def get_axes(self) -> List[float]:
-        return [self.joystick.get_axis(i) for i in range(self.num_axes)]
+        return list(self.input.snapshot.axes) if self.input else []
 
     def get_buttons(self) -> List[bool]:
-
-        pygame.event.pump()
-        return [self.joystick.get_button(i) for i in range(self.num_buttons)]
+        return list(self.input.snapshot.buttons) if self.input else []
 
     def get_axis_count(self) -> int:
         return self.num_axes
@@ -37,122 +72,163 @@ class Controller:
     def get_button_count(self) -> int:
         return self.num_buttons
     
+    def stop(self):
+        self.running = False
+
     def update_joystick_display(self, joystick_display_widget):
-        buttons = self.get_buttons()
-        axes = self.get_axes()
+        # Only reads the snapshot published by the control loop; the Qt thread
+        # never touches the device itself
+        joystick_input = self.input
+        if joystick_input is None:
+            if self.displayed_seq is not None or not joystick_display_widget.toPlainText():
+                self.displayed_seq = None
+                joystick_display_widget.setText("No joystick connected")
+            return
+        snapshot = joystick_input.snapshot
+        if snapshot.seq == self.displayed_seq:
+            return
+        self.displayed_seq = snapshot.seq
 
         joystick_text = ""
 
-        for i, button in enumerate(buttons):
+        for i, button in enumerate(snapshot.buttons):
             if button:  
                 joystick_text += f"Button {i+1}: Pressed\n"
 
         axis_threshold = 0.1  
-        for i, axis_value in enumerate(axes):
+        for i, axis_value in enumerate(snapshot.axes):
             if abs(axis_value) > axis_threshold:  
                 joystick_text += f"Axis {i+1}: {axis_value:.2f}\n"
 
-        joystick_display_widget.setText(joystick_text)
-        joystick_display_widget.moveCursor(QTextCursor.End)
+        if joystick_text != joystick_display_widget.toPlainText():
+            joystick_display_widget.setText(joystick_text)
+            joystick_display_widget.moveCursor(QTextCursor.End)
         
     def run_joystick_control(self, MetricsSystem, recording_active):
-            AXIS_THRESHOLD = 0.3 
-            recording_active = False 
-            while True:
-                pygame.event.pump() 
-                buttons = self.get_buttons()
-                axes = self.get_axes()
-
-                # Button 1: Capture photo
-                if buttons[0]:
-                    MetricsSystem.take_photo()
-                    sleep(2)
-
-                # Button 2: Start/stop recording
-                if buttons[1]:
-                    if not recording_active:
-                        MetricsSystem.start_recording()
-                        recording_active = True
-                        print('Recording started')
-                    else:
-                        MetricsSystem.stop_recording()
-                        recording_active = False
-                        print('Recording stopped')
-                    sleep(1)
-
-                # Button 3: Pause recording
-                if buttons[2] and recording_active:
-                    MetricsSystem.pause_recording()
-                    sleep(1)
-
-                # Button 4: Resume recording
-                if buttons[3] and recording_active:
-                    MetricsSystem.resume_recording()
-                    sleep(1)
-
-                # Button 5: Move up
-                if buttons[4]:
-                    MetricsSystem.send_msg("up 30")
-                
-                # Button 6: Move down
-                if buttons[5]:
-                    MetricsSystem.send_msg("down 30")
-
-                # Button 7 for Takeoff
-                if len(buttons) > 7:
-                    if buttons[6]:
-                        MetricsSystem.send_msg('takeoff')
-                        print('Takeoff')
-                        sleep(1)
-                    # Button 8 for Land
-                    elif buttons[7]:
-                        MetricsSystem.send_msg('land')
-                        print('Land')
-                        sleep(1)
-
-                # Left/Right (no threshold)
-                if abs(axes[0]) <= 1:  
-                    move = int(10 + (abs(axes[0]) * 90)) 
-                    if axes[0] < 0:  # Moving left
-                        MetricsSystem.send_msg(f"left {move}")
-                        # print(f"Moving left at move {move}")
-                    elif axes[0] > 0:  # Moving right
-                        MetricsSystem.send_msg(f"right {move}")
-                        # print(f"Moving right at move {move}")
-                
-                # Forward/Backward (no threshold)
-                if abs(axes[1]) <= 1:  
-                    move = int(10 + (abs(axes[1]) * 90)) 
-                    if axes[1] < 0:  # Moving forward
-                        MetricsSystem.send_msg(f"forward {move}")
-                        # print(f"Moving forward at move {move}")
-                    elif axes[1] > 0:  # Moving backward
-                        MetricsSystem.send_msg(f"back {move}")
-                        # print(f"Moving backward at speed {speed}")
-
-                if abs(axes[2]) > AXIS_THRESHOLD:
-                    # Hitung derajat rotasi berdasarkan nilai axis dengan batas maksimal 90
-                    rotation_degree = int(abs(axes[2]) * 90)  # Konversi ke integer
-                    if axes[2] > AXIS_THRESHOLD:
-                        MetricsSystem.send_msg(f"cw {rotation_degree}")  
-                        print(f"Rotating clockwise: {rotation_degree} degrees")
-                    elif axes[2] < -AXIS_THRESHOLD:
-                        MetricsSystem.send_msg(f"ccw {rotation_degree}")  
-                        print(f"Rotating counterclockwise: {rotation_degree} degrees")
-                
-                # Speed adjustment using Axis 4 (axes[3])
-                if len(axes) > 3:
-                    speed = int(100 - (axes[3] + 1) * 45) 
-
-                    MetricsSystem.send_msg(f"speed {speed}")
-                    print(f"Speed set to: {speed}")
-
-
-                if buttons[8]:  
-                    MetricsSystem.send_msg("flip l")
-                if buttons[9]:  
-                    MetricsSystem.send_msg("flip r")
-                if buttons[10]:  
-                    MetricsSystem.send_msg("flip f")
-                if buttons[11]:  
-                    MetricsSystem.send_msg("flip b")
+        period = 1.0 / self.control_rate
+        next_tick = monotonic()
+        ticks = metrics.counter("control.ticks")
+        tick_late_ms = metrics.histogram("control.tick_late_ms")
+        recording_active = False 
+        self.running = True
+        while self.running:
+            snapshot = self.sample_input(MetricsSystem)
+            if snapshot is not None:
+                recording_active = self.handle_input(MetricsSystem, snapshot, recording_active)
+
+            # Fixed-rate schedule; if a tick overran, start again from now
+            # rather than bursting to catch up
+            next_tick += period
+            delay = next_tick - monotonic()
+            if delay > 0:
+                sleep(delay)
+                late = monotonic() - next_tick
+            else:
+                late = -delay
+                next_tick = monotonic()
+            self.tick_lateness_ms += (late * 1000 - self.tick_lateness_ms) * 0.1
+            ticks.inc()
+            tick_late_ms.observe(late * 1000)
+
+    def sample_input(self, MetricsSystem):
+        joystick_input = self.input
+        if joystick_input is None:
+            now = monotonic()
+            if now >= self.next_scan:
+                self.next_scan = now + JOYSTICK_SCAN_INTERVAL
+                self.scan_for_joystick()
+            return None
+
+        snapshot = joystick_input.sample()
+        if not joystick_input.connected:
+            logger.warning("Joystick disconnected")
+            self.detach()
+            # Stop whatever the sticks were commanding instead of leaving the
+            # drone on its last rc values
+            MetricsSystem.send_msg_nowait(self.rc.format((0, 0, 0, 0)))
+            return None
+        return snapshot
+
+    def scan_for_joystick(self):
+        # Only the first scan, which loads pygame, belongs in the startup report
+        first, self.scanned = not self.scanned, True
+        try:
+            with startup.span("joystick subsystem") if first else nullcontext():
+                joystick = find_joystick()
+        except Exception as e:
+            logger.error(f"Joystick support unavailable: {e}")
+            self.next_scan = float("inf")
+            return
+        if joystick is not None:
+            self.attach(joystick)
+            startup.mark("joystick attached")
+
+    def handle_input(self, MetricsSystem, snapshot, recording_active):
+        buttons = snapshot.buttons
+        pressed = snapshot.pressed
+
+        # Buttons act once per press instead of sleeping to debounce, so
+        # the rc stream below never stalls
+
+        # Button 1: Capture photo
+        if 0 in pressed:
+            MetricsSystem.take_photo()
+
+        # Button 2: Start/stop recording
+        if 1 in pressed:
+            if not recording_active:
+                MetricsSystem.start_recording()
+                recording_active = True
+                logger.info('Recording started')
+            else:
+                MetricsSystem.stop_recording()
+                recording_active = False
+                logger.info('Recording stopped')
+
+        # Button 3: Pause recording
+        if 2 in pressed and recording_active:
+            MetricsSystem.pause_recording()
+
+        # Button 4: Resume recording
+        if 3 in pressed and recording_active:
+            MetricsSystem.resume_recording()
+
+        # Button 7 for Takeoff
+        if 6 in pressed:
+            MetricsSystem.send_msg_async('takeoff')
+            logger.info('Takeoff')
+        # Button 8 for Land
+        elif 7 in pressed:
+            MetricsSystem.send_msg_async('land')
+            logger.info('Land')
+
+        # Buttons 5/6 drive the throttle channel, the sticks the rest
+        up = len(buttons) > 4 and buttons[4]
+        down = len(buttons) > 5 and buttons[5]
+        channels = self.rc.build(snapshot.axes, up=up, down=down)
+        MetricsSystem.send_msg_nowait(self.rc.format(channels))
+
+        # Speed adjustment using Axis 4 (axes[3]), only sent on change; the
+        # scheduler keeps just the newest if the drone is still busy
+        speed = self.rc.speed(snapshot.axes)
+        if speed is not None and speed != self.last_speed:
+            MetricsSystem.send_msg_async(f"speed {speed}", callback=partial(self.speed_done, speed))
+            self.last_speed = speed
+            logger.debug(f"Speed set to: {speed}")
+
+        if 8 in pressed:  
+            MetricsSystem.send_msg_async("flip l")
+        if 9 in pressed:  
+            MetricsSystem.send_msg_async("flip r")
+        if 10 in pressed:  
+            MetricsSystem.send_msg_async("flip f")
+        if 11 in pressed:  
+            MetricsSystem.send_msg_async("flip b")
+
+        return recording_active
+
+    def speed_done(self, speed, future):
+        # Network thread. A speed the drone did not take is sent again on
+        # the next sample, unless the stick has moved on since
+        if (future.cancelled() or future.result() != "ok") and self.last_speed == speed:
+            self.last_speed = None
@@ -0,0 +1,223 @@
+import multiprocessing as mp
+import cv2 as cv
+import numpy as np
+
+from multiprocessing import shared_memory
+
+from manager.CameraFilter import CameraFilter
+from manager.SegmentedRecorder import SegmentedRecorder
+
+# Per-slot header: frame seq (0 while being written), height, width
+HEADER_FIELDS = 3
+
+# The parent runs Qt, the network loop and thread pools by the time the
+# worker starts; forking it could copy a lock some other thread holds and
+# hang the child, so the worker starts from a fresh interpreter
+MP_CONTEXT = mp.get_context("spawn")
+
+
+class SharedFrameRing:
+    def __init__(self, slots, max_width, max_height, name=None, create=False):
+        self.slots = slots
+        self.max_width = max_width
+        self.max_height = max_height
+        self.slot_bytes = max_width * max_height * 3
+        header_bytes = (slots + 1) * HEADER_FIELDS * 8
+
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + slots * self.slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+        # The extra header row holds the latest published seq and slot index
+        self.header = np.ndarray((slots + 1, HEADER_FIELDS), dtype=np.int64, buffer=self.shm.buf)
+        self.buffers = [
+            np.ndarray((self.slot_bytes,), dtype=np.uint8, buffer=self.shm.buf,
+                       offset=header_bytes + i * self.slot_bytes)
+            for i in range(slots)
+        ]
+        if create:
+            self.header[:] = 0
+
+    def write(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.max_width or height > self.max_height:
+            scale = min(self.max_width / width, self.max_height / height)
+            frame = cv.resize(frame, (int(width * scale), int(height * scale)))
+            height, width = frame.shape[:2]
+
+        latest = self.header[self.slots]
+        seq = int(latest[0]) + 1
+        index = seq % self.slots
+
+        # Seqlock: readers discard a slot whose seq is 0 or changed under them
+        slot = self.header[index]
+        slot[0] = 0
+        slot[1] = height
+        slot[2] = width
+        self.buffers[index][:height * width * 3].reshape(height, width, 3)[:] = frame
+        slot[0] = seq
+
+        latest[1] = index
+        latest[0] = seq
+
+    def read(self, last_seq=0):
+        for _ in range(3):
+            latest = self.header[self.slots]
+            index = int(latest[1])
+            slot = self.header[index]
+            seq = int(slot[0])
+            if seq == 0 or seq <= last_seq:
+                return 0, None
+            height, width = int(slot[1]), int(slot[2])
+            frame = self.buffers[index][:height * width * 3].reshape(height, width, 3).copy()
+            if int(slot[0]) == seq:
+                return seq, frame
+        return 0, None
+
+    def close(self):
+        self.header = None
+        self.buffers = []
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def decode_worker_main(url, shm_name, slots, max_width, max_height, conn, frame_event, filter_name):
+    ring = SharedFrameRing(slots, max_width, max_height, name=shm_name)
+    camera_filter = CameraFilter()
+    camera_filter.set_filter(filter_name)
+    recorder = None
+    finishing = None
+
+    cap = cv.VideoCapture(url)
+    if not cap.isOpened():
+        conn.send(("error", "Could not open video stream."))
+        ring.close()
+        return
+
+    running = True
+    while running:
+        while conn.poll():
+            message = conn.recv()
+            command = message[0]
+            if command == "stop":
+                running = False
+            elif command == "filter":
+                camera_filter.set_filter(message[1])
+            elif command == "processing":
+                camera_filter.set_processing(message[1])
+            elif command == "record_start":
+                recorder = SegmentedRecorder(*message[1:])
+                recorder.start()
+            elif command == "record_stop" and recorder:
+                recorder.stop()
+                conn.send(("recorded", recorder.path, recorder.dropped))
+                recorder, finishing = None, recorder
+            elif command == "pause" and recorder:
+                recorder.pause()
+            elif command == "resume" and recorder:
+                recorder.resume()
+
+        ret, img = cap.read()
+        if not ret:
+            continue
+        img = camera_filter.apply_filter(img)
+        if recorder and recorder.wants_frames:
+            recorder.write_frame(img)
+        ring.write(img)
+        frame_event.set()
+
+    if recorder:
+        recorder.stop()
+        finishing = recorder
+    if finishing:
+        # Within the time DecodeWorker.stop gives the process to exit
+        finishing.wait(timeout=2)
+    cap.release()
+    ring.close()
+
+
+class DecodeWorker:
+    def __init__(self, slots=4, max_width=960, max_height=720):
+        self.slots = slots
+        self.max_width = max_width
+        self.max_height = max_height
+        self.ring = None
+        self.process = None
+        self.conn = None
+        self.frame_event = None
+        self.last_seq = 0
+
+    def start(self, url, filter_name="normal"):
+        self.ring = SharedFrameRing(self.slots, self.max_width, self.max_height, create=True)
+        self.conn, child_conn = MP_CONTEXT.Pipe()
+        self.frame_event = MP_CONTEXT.Event()
+        self.process = MP_CONTEXT.Process(
+            target=decode_worker_main,
+            args=(url, self.ring.name, self.slots, self.max_width, self.max_height,
+                  child_conn, self.frame_event, filter_name),
+            daemon=True,
+        )
+        self.process.start()
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def send(self, *message):
+        if self.is_alive():
+            self.conn.send(message)
+
+    def set_filter(self, filter_name):
+        self.send("filter", filter_name)
+
+    def set_processing(self, preset):
+        self.send("processing", preset)
+
+    def start_recording(self, mode, directory, container="mp4", segment_duration=60.0):
+        self.send("record_start", mode, directory, container, segment_duration)
+
+    def stop_recording(self):
+        self.send("record_stop")
+
+    def pause_recording(self):
+        self.send("pause")
+
+    def resume_recording(self):
+        self.send("resume")
+
+    def poll_messages(self):
+        messages = []
+        try:
+            while self.conn is not None and self.conn.poll():
+                messages.append(self.conn.recv())
+        except (EOFError, OSError):
+            pass
+        return messages
+
+    def read_frame(self, timeout=0.5):
+        if not self.frame_event.wait(timeout):
+            return None
+        self.frame_event.clear()
+        ring = self.ring
+        if ring is None:
+            return None
+        seq, frame = ring.read(self.last_seq)
+        if frame is None:
+            return None
+        self.last_seq = seq
+        return frame
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.send("stop")
+        self.process.join(timeout=3)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+        self.ring.close()
+        self.ring.unlink()
+        self.ring = None
@@ -0,0 +1,109 @@
+from time import monotonic
+
+# (max display fps, display scale), best quality first
+LEVELS = (
+    (30, 1.0),
+    (25, 1.0),
+    (20, 1.0),
+    (20, 0.75),
+    (15, 0.75),
+    (15, 0.5),
+    (10, 0.5),
+)
+
+STAGES = ("decode", "filter", "scale", "paint")
+
+# Stages whose cost follows the display resolution; decode and filter run on
+# every captured frame at full size whatever the display does
+SCALED_STAGES = ("scale", "paint")
+
+
+class DisplayGovernor:
+    # Watches per-stage frame cost and how far the GUI lags behind the
+    # decoder, and walks the display down LEVELS when the machine cannot keep
+    # up, or when control/telemetry latency leaves its budget. Steps back up
+    # only after a quiet period with clear headroom.
+    def __init__(self, levels=LEVELS, control_budget_ms=10.0, telemetry_budget_ms=250.0,
+                 headroom=0.6, down_interval=1.0, up_interval=4.0, smoothing=0.2):
+        self.levels = levels
+        self.control_budget_ms = control_budget_ms
+        self.telemetry_budget_ms = telemetry_budget_ms
+        self.headroom = headroom
+        self.down_interval = down_interval
+        self.up_interval = up_interval
+        self.smoothing = smoothing
+
+        self.stage_ms = dict.fromkeys(STAGES, 0.0)
+        self.lag_ms = 0.0
+        self.level = 0
+        self.last_change = monotonic()
+        self.reason = "startup"
+
+    @property
+    def fps(self):
+        return self.levels[self.level][0]
+
+    @property
+    def scale(self):
+        return self.levels[self.level][1]
+
+    def record(self, stage, ms):
+        previous = self.stage_ms[stage]
+        self.stage_ms[stage] = previous + (ms - previous) * self.smoothing
+
+    def record_lag(self, ms):
+        self.lag_ms += (ms - self.lag_ms) * self.smoothing
+
+    def frame_cost(self, level=None):
+        # Estimated ms per displayed frame at a level, scaling the
+        # resolution-dependent stages by pixel count
+        level = self.level if level is None else level
+        ratio = (self.levels[level][1] / self.scale) ** 2
+        cost = 0.0
+        for stage, ms in self.stage_ms.items():
+            cost += ms * ratio if stage in SCALED_STAGES else ms
+        return cost
+
+    def overload(self, control_ms=None, telemetry_ms=None):
+        budget = 1000.0 / self.fps
+        if self.lag_ms > budget:
+            return f"display lag {self.lag_ms:.0f} ms"
+        if self.frame_cost() > budget:
+            return f"frame cost {self.frame_cost():.1f} ms"
+        if control_ms is not None and control_ms > self.control_budget_ms:
+            return f"control latency {control_ms:.1f} ms"
+        if telemetry_ms is not None and telemetry_ms > self.telemetry_budget_ms:
+            return f"telemetry latency {telemetry_ms:.0f} ms"
+        return None
+
+    def evaluate(self, control_ms=None, telemetry_ms=None, now=None):
+        # Called periodically from the GUI; returns True when the level changed
+        now = monotonic() if now is None else now
+        since_change = now - self.last_change
+
+        reason = self.overload(control_ms, telemetry_ms)
+        if reason:
+            if self.level + 1 < len(self.levels) and since_change >= self.down_interval:
+                return self.set_level(self.level + 1, reason, now)
+            return False
+
+        if self.level == 0 or since_change < self.up_interval:
+            return False
+        target = self.level - 1
+        budget = 1000.0 / self.levels[target][0]
+        if self.frame_cost(target) < budget * self.headroom and self.lag_ms < budget * self.headroom:
+            return self.set_level(target, "headroom", now)
+        return False
+
+    def set_level(self, level, reason, now=None):
+        self.level = max(0, min(len(self.levels) - 1, level))
+        self.reason = reason
+        self.last_change = monotonic() if now is None else now
+        return True
+
+    def status(self):
+        return f"{self.fps} fps @ {self.scale:.0%}"
+
+    def details(self):
+        stages = ", ".join(f"{stage} {ms:.1f}" for stage, ms in self.stage_ms.items())
+        return f"{stages} ms, lag {self.lag_ms:.1f} ms, last change: {self.reason}"
@@ -0,0 +1,68 @@
+from manager.NetworkHub import NetworkHub
+
+TELLO_HOST = "192.168.10.1"
+COMMAND_PORT = 8889
+LOCAL_COMMAND_PORT = 9000
+STATE_PORT = 8890
+VIDEO_PORT = 11111
+
+
+class DroneEndpoints:
+    # Where one drone lives and which local ports its traffic uses. Several
+    # drones may share the local ports; the hub tells them apart by host.
+    def __init__(self, host=TELLO_HOST, command_port=COMMAND_PORT, local_port=LOCAL_COMMAND_PORT,
+                 state_port=STATE_PORT, video_port=VIDEO_PORT, name=None):
+        self.host = host
+        self.command_port = command_port
+        self.local_port = local_port
+        self.state_port = state_port
+        self.video_port = video_port
+        # Optional label, also used to tell the sessions' log files apart
+        self.name = name
+
+    @property
+    def command_addr(self):
+        return (self.host, self.command_port)
+
+    @property
+    def custom_ports(self):
+        # Drones only stream to non-default ports after an SDK "port" command
+        return self.state_port != STATE_PORT or self.video_port != VIDEO_PORT
+
+    @property
+    def label(self):
+        return self.name or self.host
+
+    def __repr__(self):
+        return (f"DroneEndpoints({self.label}: {self.host}:{self.command_port}, local {self.local_port}, "
+                f"state {self.state_port}, video {self.video_port})")
+
+
+class SessionGroup:
+    # Several drones flown from one station: every session shares one
+    # network thread and one worker pool instead of owning its own
+    def __init__(self, workers=4):
+        self.hub = NetworkHub(workers)
+        self.sessions = {}
+
+    def add(self, endpoints, **options):
+        # Imported here; MetricsSystem itself imports this module
+        from manager.MetricsSystem import MetricsSystem
+        session = MetricsSystem(endpoints=endpoints, hub=self.hub, **options)
+        self.sessions[endpoints.label] = session
+        return session
+
+    def get(self, name):
+        return self.sessions.get(name)
+
+    def __iter__(self):
+        return iter(self.sessions.values())
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def close(self):
+        for session in self.sessions.values():
+            session.stop_drone_operations()
+        self.sessions.clear()
+        self.hub.shutdown()
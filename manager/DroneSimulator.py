@@ -0,0 +1,332 @@
+import heapq
+import random
+import socket
+import logging
+import argparse
+import subprocess
+import numpy as np
+
+from threading import Thread, Event, Lock, Condition
+from time import monotonic, sleep, perf_counter
+
+from manager.Recorder import FFMPEG
+
+logger = logging.getLogger(__name__)
+
+# Replies for the read commands the GCS may send; anything else is acknowledged
+QUERY_REPLIES = {
+    "battery?": lambda sim: f"{sim.battery:.0f}",
+    "speed?": lambda sim: f"{sim.speed:.1f}",
+    "time?": lambda sim: f"{sim.flight_time:.0f}s",
+    "height?": lambda sim: f"{sim.height / 10:.0f}dm",
+}
+
+# Manoeuvres take a while before the drone answers
+ACTION_TIMES = {
+    "takeoff": 2.0,
+    "land": 2.0,
+    "flip": 1.0,
+}
+
+MARKER_BITS = 16
+MARKER_CELL = 16
+
+
+def draw_marker(frame, value):
+    # Frame number as black/white cells along the top edge; large enough to
+    # survive H.264 compression and cheap to read back after decoding
+    for bit in range(MARKER_BITS):
+        x = bit * MARKER_CELL
+        frame[:MARKER_CELL, x:x + MARKER_CELL] = 255 if value >> bit & 1 else 0
+
+
+def read_marker(frame):
+    value = 0
+    half = MARKER_CELL // 2
+    for bit in range(MARKER_BITS):
+        if frame[half, bit * MARKER_CELL + half].mean() > 127:
+            value |= 1 << bit
+    return value
+
+
+class DroneSimulator:
+    # Local stand-in for a Tello: SDK commands on command_port, state packets
+    # and an H.264 stream sent back to whoever last sent "command". Latency,
+    # jitter and loss apply to command replies.
+    def __init__(self, host="127.0.0.1", command_port=8889, state_port=8890, video_port=11111,
+                 latency=0.01, jitter=0.0, loss=0.0, action_scale=1.0, state_rate=10.0,
+                 video=True, fps=30, size=(960, 720), seed=None):
+        self.host = host
+        self.command_port = command_port
+        self.state_port = state_port
+        self.video_port = video_port
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.action_scale = action_scale
+        self.state_rate = state_rate
+        self.video = video
+        self.fps = fps
+        self.size = size
+        self.random = random.Random(seed)
+
+        self.client_host = host
+        self.sock = None
+        self.running = Event()
+        self.threads = []
+        self.replies = []
+        self.replies_ready = Condition(Lock())
+
+        self.commands = {}
+        self.rc_packets = 0
+        self.states_sent = 0
+        self.rc = (0, 0, 0, 0)
+        self.flying = False
+        self.battery = 100.0
+        self.height = 0.0
+        self.speed = 100.0
+        self.flight_time = 0.0
+        self.takeoff_at = 0.0
+
+        self.streaming = False
+        self.encoder = None
+        self.frame_sent_at = {}
+        self.frames_sent = 0
+
+    @property
+    def addr(self):
+        return (self.host, self.command_port)
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((self.host, self.command_port))
+        self.sock.settimeout(0.1)
+        self.running.set()
+        for target in (self.command_loop, self.reply_loop, self.state_loop):
+            thread = Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        self.running.clear()
+        with self.replies_ready:
+            self.replies_ready.notify_all()
+        self.stop_video()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.threads = []
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def command_loop(self):
+        while self.running.is_set():
+            try:
+                data, sender = self.sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            command = data.decode("utf-8", errors="replace").strip()
+            name = command.split(" ", 1)[0]
+            self.commands[name] = self.commands.get(name, 0) + 1
+
+            if name == "rc":
+                # rc is fire and forget on the real drone too
+                self.rc_packets += 1
+                try:
+                    self.rc = tuple(int(v) for v in command.split()[1:5])
+                except ValueError:
+                    pass
+                continue
+            if self.random.random() < self.loss:
+                continue
+
+            if name == "command":
+                self.client_host = sender[0]
+            reply, delay = self.execute(name, command)
+            delay += self.latency + self.random.uniform(0, self.jitter)
+            with self.replies_ready:
+                heapq.heappush(self.replies, (monotonic() + delay, reply, sender))
+                self.replies_ready.notify()
+
+    def execute(self, name, command):
+        if name in QUERY_REPLIES:
+            return QUERY_REPLIES[name](self), 0.0
+        delay = ACTION_TIMES.get(name, 0.0) * self.action_scale
+        if name == "takeoff":
+            self.flying = True
+            self.takeoff_at = monotonic()
+            self.height = 80.0
+        elif name == "land":
+            self.flying = False
+            self.height = 0.0
+        elif name == "speed":
+            try:
+                self.speed = float(command.split()[1])
+            except (IndexError, ValueError):
+                return "error", 0.0
+        elif name == "streamon":
+            self.start_video()
+        elif name == "streamoff":
+            self.stop_video()
+        return "ok", delay
+
+    def reply_loop(self):
+        # Replies go out in due order from one thread, so a slow manoeuvre
+        # delays only its own answer
+        while self.running.is_set():
+            with self.replies_ready:
+                while self.running.is_set() and not self.replies:
+                    self.replies_ready.wait()
+                if not self.replies:
+                    break
+                due, reply, sender = self.replies[0]
+                wait = due - monotonic()
+                if wait > 0:
+                    self.replies_ready.wait(wait)
+                    continue
+                heapq.heappop(self.replies)
+            try:
+                self.sock.sendto(reply.encode("utf-8"), sender)
+            except OSError:
+                break
+
+    def state_string(self):
+        now = monotonic()
+        lr, fb, ud, yaw = self.rc
+        if self.flying:
+            self.flight_time = now - self.takeoff_at
+            self.height = max(20.0, self.height + ud * 0.01)
+            self.battery = max(0.0, self.battery - 0.002)
+        return (
+            f"mid:-1;x:0;y:0;z:0;mpry:0,0,0;pitch:{fb // 10};roll:{lr // 10};yaw:{yaw // 5};"
+            f"vgx:{fb // 10};vgy:{lr // 10};vgz:{ud // 10};templ:60;temph:63;tof:{self.height + 10:.0f};"
+            f"h:{self.height:.0f};bat:{self.battery:.0f};baro:{self.height / 100:.2f};"
+            f"time:{self.flight_time:.0f};agx:0.00;agy:0.00;agz:-1000.00;\r\n"
+        )
+
+    def state_loop(self):
+        state_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Sent from the simulator's own address so a GCS flying several
+        # simulated drones can tell them apart
+        state_sock.bind((self.host, 0))
+        period = 1.0 / self.state_rate
+        next_tick = monotonic()
+        try:
+            while self.running.is_set():
+                try:
+                    state_sock.sendto(self.state_string().encode("utf-8"), (self.client_host, self.state_port))
+                    self.states_sent += 1
+                except OSError:
+                    pass
+                next_tick += period
+                delay = next_tick - monotonic()
+                if delay > 0:
+                    sleep(delay)
+                else:
+                    next_tick = monotonic()
+        finally:
+            state_sock.close()
+
+    def start_video(self):
+        if not self.video or self.streaming:
+            return
+        if FFMPEG is None:
+            logger.warning("ffmpeg not found, simulator video disabled")
+            return
+        width, height = self.size
+        command = [
+            FFMPEG, "-hide_banner", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(self.fps),
+            "-i", "pipe:0",
+            "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
+            "-g", str(self.fps), "-bf", "0", "-pix_fmt", "yuv420p",
+            "-f", "h264", f"udp://{self.client_host}:{self.video_port}?pkt_size=1460&localaddr={self.host}",
+        ]
+        self.encoder = subprocess.Popen(command, stdin=subprocess.PIPE)
+        self.streaming = True
+        thread = Thread(target=self.video_loop, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def stop_video(self):
+        self.streaming = False
+        encoder, self.encoder = self.encoder, None
+        if encoder is not None:
+            try:
+                encoder.stdin.close()
+            except OSError:
+                pass
+            try:
+                encoder.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                encoder.kill()
+
+    def video_loop(self):
+        width, height = self.size
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)
+        period = 1.0 / self.fps
+        next_tick = monotonic()
+        number = 0
+        encoder = self.encoder
+        while self.streaming and self.running.is_set():
+            # A moving gradient gives the encoder realistic work and the
+            # filters something to chew on
+            frame[:] = np.roll(gradient, number * 4)[None, :, None]
+            draw_marker(frame, number & 0xFFFF)
+            self.frame_sent_at[number & 0xFFFF] = perf_counter()
+            try:
+                encoder.stdin.write(frame.tobytes())
+            except (BrokenPipeError, OSError, ValueError):
+                break
+            number += 1
+            self.frames_sent = number
+            next_tick += period
+            delay = next_tick - monotonic()
+            if delay > 0:
+                sleep(delay)
+            else:
+                next_tick = monotonic()
+
+    def frame_latency(self, frame):
+        # Seconds from the simulator handing a frame to the encoder until the
+        # given decoded frame; None if the marker is not recognised
+        sent_at = self.frame_sent_at.get(read_marker(frame))
+        if sent_at is None:
+            return None
+        return perf_counter() - sent_at
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated Tello for running the GCS without hardware")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--state-rate", type=float, default=10.0)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--no-video", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    simulator = DroneSimulator(
+        host=args.host, latency=args.latency, jitter=args.jitter, loss=args.loss,
+        state_rate=args.state_rate, video=not args.no_video, fps=args.fps,
+    )
+    with simulator:
+        logger.info(f"Simulated drone listening on {simulator.addr}")
+        try:
+            while True:
+                sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,119 @@
+import os
+import logging
+import struct
+import numpy as np
+
+from datetime import datetime
+from time import time, monotonic
+
+from manager.Telemetry import FIELDS
+
+COLUMNS = ("timestamp",) + FIELDS
+
+LOG_MAGIC = b"GCSFLOG1"
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "drone_capture", "log")
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryHistory:
+    # Column-per-field ring buffer; appends are one strided store into a
+    # preallocated array, reads return chronologically ordered copies
+    def __init__(self, capacity=36000):
+        self.capacity = capacity
+        self.index = {name: i for i, name in enumerate(COLUMNS)}
+        self.data = np.full((len(COLUMNS), capacity), np.nan)
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, values):
+        self.data[:, self.count % self.capacity] = values
+        self.count += 1
+
+    def column(self, name, last=None, end=None):
+        # end is a count read earlier, so a reader on another thread can take
+        # several columns up to the same sample
+        count = self.count if end is None else end
+        size = min(count, self.capacity)
+        if last is not None:
+            size = min(size, last)
+        end = count % self.capacity
+        start = end - size
+        row = self.data[self.index[name]]
+        if start >= 0:
+            return row[start:end].copy()
+        return np.concatenate((row[start:], row[:end]))
+
+    def columns(self, last=None):
+        return {name: self.column(name, last) for name in COLUMNS}
+
+
+class FlightRecorder:
+    def __init__(self, capacity=36000, log_dir=LOG_DIR, batch_size=50, flush_interval=2.0, name=None):
+        self.history = TelemetryHistory(capacity)
+        self.log_dir = log_dir
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.record = struct.Struct("<" + "d" * len(COLUMNS))
+        self.batch = bytearray()
+        self.batch_count = 0
+        self.last_flush = monotonic()
+        self.log_file = None
+        self.log_path = None
+
+    def open_log(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = f"_{self.name}" if self.name else ""
+        self.log_path = os.path.join(self.log_dir, f"flight_{date_str}{suffix}.bin")
+        self.log_file = open(self.log_path, "ab")
+        names = ",".join(COLUMNS).encode()
+        self.log_file.write(LOG_MAGIC + struct.pack("<H", len(names)) + names)
+
+    def append(self, state):
+        values = (time(),) + tuple(getattr(state, name) for name in FIELDS)
+        self.history.append(values)
+
+        self.batch += self.record.pack(*values)
+        self.batch_count += 1
+        if self.batch_count >= self.batch_size or monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            try:
+                if self.log_file is None:
+                    self.open_log()
+                self.log_file.write(self.batch)
+                self.log_file.flush()
+            except OSError as e:
+                logger.error(f"Error writing flight log: {e}")
+        self.batch = bytearray()
+        self.batch_count = 0
+        self.last_flush = monotonic()
+
+    def close(self):
+        self.flush()
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+
+def load_flight_log(path):
+    with open(path, "rb") as f:
+        if f.read(len(LOG_MAGIC)) != LOG_MAGIC:
+            raise ValueError(f"{path} is not a flight log")
+        (length,) = struct.unpack("<H", f.read(2))
+        names = f.read(length).decode().split(",")
+        offset = f.tell()
+
+    dtype = np.dtype([(name, "<f8") for name in names])
+    data = np.fromfile(path, dtype=np.uint8, offset=offset)
+    # A crash can leave a partial record at the end; drop it
+    usable = len(data) - len(data) % dtype.itemsize
+    records = data[:usable].view(dtype)
+    return {name: records[name].copy() for name in names}
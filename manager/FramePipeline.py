@@ -0,0 +1,112 @@
+import numpy as np
+
+from time import monotonic, perf_counter
+
+from manager.OpenCVLoader import load_opencv
+from manager.TimedLock import TimedLock
+
+
+class FramePipeline:
+    def __init__(self, slots=3, frame_callback=None, governor=None):
+        # Three slots let the decoder write one while the GUI paints another
+        # and a third holds the newest finished frame
+        self.num_slots = max(3, slots)
+        self.frame_callback = frame_callback
+        # Optional DisplayGovernor deciding display rate and resolution
+        self.governor = governor
+
+        self.output_size = None
+        self.ring = []
+        self.scratch = None
+        self.published_at = [0.0] * self.num_slots
+        self.next_publish = 0.0
+        self.skipped = 0
+
+        self.slot_lock = TimedLock("frame_pipeline")
+        self.latest = None
+        self.reading = None
+        self.seq = 0
+        self.notify_pending = False
+
+    def set_output_size(self, width, height):
+        if width > 0 and height > 0:
+            self.output_size = (width, height)
+
+    def allocate(self, size):
+        width, height = size
+        self.ring = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.num_slots)]
+        self.scratch = np.empty((height, width, 3), dtype=np.uint8)
+        with self.slot_lock:
+            self.latest = None
+            self.reading = None
+
+    def free_slot(self):
+        with self.slot_lock:
+            for index in range(self.num_slots):
+                if index != self.latest and index != self.reading:
+                    return index
+        return None
+
+    def display_size(self, frame):
+        width, height = self.output_size or (frame.shape[1], frame.shape[0])
+        if self.governor is not None and self.governor.scale < 1.0:
+            width = max(1, int(width * self.governor.scale))
+            height = max(1, int(height * self.governor.scale))
+        return width, height
+
+    def due(self):
+        # Paces publishing to the governor's frame rate; recording and photos
+        # still see every frame
+        if self.governor is None:
+            return True
+        now = monotonic()
+        if now < self.next_publish:
+            self.skipped += 1
+            return False
+        interval = 1.0 / self.governor.fps
+        self.next_publish = max(self.next_publish + interval, now - interval)
+        return True
+
+    def publish(self, frame):
+        cv = load_opencv()
+        if not self.due():
+            return
+        start = perf_counter()
+        size = self.display_size(frame)
+        if not self.ring or self.ring[0].shape[:2] != (size[1], size[0]):
+            self.allocate(size)
+
+        index = self.free_slot()
+        if index is None:
+            return
+
+        # Scale and convert straight into the ring; the GUI wraps the slot as is
+        if frame.shape[:2] != self.scratch.shape[:2]:
+            cv.resize(frame, size, dst=self.scratch, interpolation=cv.INTER_LINEAR)
+            frame = self.scratch
+        cv.cvtColor(frame, cv.COLOR_BGR2RGB, dst=self.ring[index])
+        if self.governor is not None:
+            self.governor.record("scale", (perf_counter() - start) * 1000)
+
+        with self.slot_lock:
+            self.published_at[index] = monotonic()
+            self.latest = index
+            self.seq += 1
+            notify = not self.notify_pending
+            self.notify_pending = True
+
+        # One outstanding notification is enough; the GUI always takes the
+        # newest slot, so frames that arrive in between simply replace it
+        if notify and self.frame_callback:
+            self.frame_callback()
+
+    def acquire(self):
+        # The returned slot stays reserved for the reader until its next
+        # acquire: the widget repaints from it (overlay, alerts, exposes)
+        # for as long as it is on screen, so it must not be rewritten
+        with self.slot_lock:
+            self.notify_pending = False
+            if self.latest is None:
+                return None, None, None
+            self.reading = self.latest
+            return self.seq, self.ring[self.reading], self.published_at[self.reading]
@@ -0,0 +1,99 @@
+import numpy as np
+
+from collections import deque
+from time import monotonic, perf_counter
+
+from manager.OpenCVLoader import load_opencv
+
+
+class FramePool:
+    # Output buffers for the filter. A buffer only comes back once the frame
+    # holding it is gone, so however long consumers (the photo and recording
+    # queues) keep frames, a live one is never overwritten; the pool settles
+    # at as many buffers as frames are alive at once
+    def __init__(self, spare=4):
+        self.free = deque(maxlen=spare)
+
+    def take(self, like):
+        while True:
+            try:
+                buffer = self.free.pop()
+            except IndexError:
+                return np.empty_like(like)
+            # Buffers of an earlier resolution or filter are dropped
+            if buffer.shape == like.shape and buffer.dtype == like.dtype:
+                return buffer
+
+    def give(self, buffer):
+        # Any thread: frames are released wherever their last consumer lets go
+        self.free.append(buffer)
+
+
+class ProcessedFrame:
+    __slots__ = ("seq", "timestamp", "image", "scaled_cache", "pool")
+
+    def __init__(self, seq, timestamp, image, pool=None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.image = image
+        self.scaled_cache = {}
+        self.pool = pool
+
+    def __del__(self):
+        if self.pool is not None:
+            self.pool.give(self.image)
+
+    def scaled(self, size):
+        # Each resolution is produced at most once per frame, whichever
+        # consumer asks first
+        if size == (self.image.shape[1], self.image.shape[0]):
+            return self.image
+        image = self.scaled_cache.get(size)
+        if image is None:
+            cv = load_opencv()
+            image = cv.resize(self.image, size, interpolation=cv.INTER_AREA)
+            self.scaled_cache[size] = image
+        return image
+
+
+class FrameProcessor:
+    # Runs the filter exactly once per captured frame and fans the result out
+    # to display, recording and photo consumers
+    def __init__(self, apply_filter=None, governor=None):
+        self.apply_filter = apply_filter
+        self.governor = governor
+        self.subscribers = ()
+        self.seq = 0
+        self.latest = None
+        self.pool = FramePool()
+
+    def subscribe(self, callback):
+        self.subscribers = self.subscribers + (callback,)
+
+    def unsubscribe(self, callback):
+        self.subscribers = tuple(s for s in self.subscribers if s != callback)
+
+    def process(self, raw):
+        image = raw
+        pool = None
+        apply_filter = self.apply_filter
+        if apply_filter:
+            # Consumers may hold on to the result, so the filter writes into a
+            # pooled buffer owned by the frame rather than its scratch buffers
+            start = perf_counter()
+            buffer = self.pool.take(raw)
+            image = apply_filter(raw, out=buffer)
+            if image is buffer:
+                pool = self.pool
+            else:
+                # No stages: the raw frame passes through untouched
+                self.pool.give(buffer)
+            if self.governor is not None:
+                self.governor.record("filter", (perf_counter() - start) * 1000)
+
+        self.seq += 1
+        frame = ProcessedFrame(self.seq, monotonic(), image, pool)
+        self.latest = frame
+        for callback in self.subscribers:
+            callback(frame)
+        return frame
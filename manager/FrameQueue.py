@@ -0,0 +1,99 @@
+from collections import deque
+from threading import Event
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class FrameQueue:
+    # Single producer (capture thread), single consumer (recorder). deque
+    # append/popleft are atomic, so neither side takes a lock on the hot path;
+    # the events only exist so the idle side can sleep instead of polling.
+    def __init__(self, capacity=10, policy=DROP_OLDEST, block_timeout=0.1):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self.items = deque()
+        self.not_empty = Event()
+        self.not_full = Event()
+        self.not_full.set()
+
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, frame):
+        if len(self.items) >= self.capacity:
+            if self.policy == DROP_NEWEST:
+                self.dropped += 1
+                return False
+            if self.policy == DROP_OLDEST:
+                try:
+                    self.items.popleft()
+                    self.dropped += 1
+                except IndexError:
+                    pass
+            elif not self.wait_not_full():
+                self.dropped += 1
+                return False
+
+        self.items.append(frame)
+        self.enqueued += 1
+        self.not_empty.set()
+        return True
+
+    def wait_not_full(self):
+        # Clear before re-checking so a get() that lands in between still wakes us
+        while len(self.items) >= self.capacity:
+            self.not_full.clear()
+            if len(self.items) < self.capacity:
+                break
+            if not self.not_full.wait(self.block_timeout):
+                return False
+        return True
+
+    def get(self, timeout=None):
+        try:
+            frame = self.items.popleft()
+        except IndexError:
+            self.not_empty.clear()
+            if not self.items and not self.not_empty.wait(timeout):
+                return None
+            try:
+                frame = self.items.popleft()
+            except IndexError:
+                # Woken by wake() with nothing queued
+                return None
+        self.dequeued += 1
+        self.not_full.set()
+        return frame
+
+    def wake(self):
+        self.not_empty.set()
+
+    def clear(self):
+        # Also starts the counters afresh, so stats() covers one recording
+        self.items.clear()
+        self.not_full.set()
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+
+    def stats(self):
+        return {
+            "depth": len(self.items),
+            "capacity": self.capacity,
+            "policy": self.policy,
+            "enqueued": self.enqueued,
+            "dequeued": self.dequeued,
+            "dropped": self.dropped,
+        }
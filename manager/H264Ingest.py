@@ -0,0 +1,446 @@
+import logging
+import importlib.util
+
+from collections import deque
+from threading import Thread, Event
+from time import monotonic, thread_time
+
+from manager.Instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+NAL_SLICE = 1
+NAL_IDR = 5
+NAL_SEI = 6
+NAL_SPS = 7
+NAL_PPS = 8
+NAL_AUD = 9
+
+START_CODE = b"\x00\x00\x01"
+
+# SPS profiles that carry chroma format and scaling lists
+HIGH_PROFILES = (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135)
+
+
+def ingest_available():
+    # PyAV is imported by the decoder itself, off the startup path
+    return importlib.util.find_spec("av") is not None
+
+
+class BitReader:
+    def __init__(self, data):
+        # Emulation prevention bytes are not part of the syntax
+        data = bytes(data).replace(b"\x00\x00\x03", b"\x00\x00")
+        self.value = int.from_bytes(data, "big")
+        self.size = len(data) * 8
+        self.pos = 0
+
+    def read(self, bits):
+        if self.pos + bits > self.size:
+            raise ValueError("truncated NAL")
+        self.pos += bits
+        return (self.value >> (self.size - self.pos)) & ((1 << bits) - 1)
+
+    def ue(self):
+        zeros = 0
+        while not self.read(1):
+            zeros += 1
+            if zeros > 31:
+                raise ValueError("bad exp-Golomb code")
+        return (1 << zeros) - 1 + self.read(zeros)
+
+    def se(self):
+        value = self.ue()
+        return (value + 1) // 2 if value & 1 else -(value // 2)
+
+
+def skip_scaling_list(reader, size):
+    last = next_scale = 8
+    for _ in range(size):
+        if next_scale:
+            next_scale = (last + reader.se() + 256) % 256
+        last = next_scale or last
+
+
+def parse_sps(payload):
+    # Only what the slice header needs to locate frame_num
+    reader = BitReader(payload[1:])
+    profile = reader.read(8)
+    reader.read(16)
+    reader.ue()
+    separate_planes = 0
+    if profile in HIGH_PROFILES:
+        chroma_format = reader.ue()
+        if chroma_format == 3:
+            separate_planes = reader.read(1)
+        reader.ue()
+        reader.ue()
+        reader.read(1)
+        if reader.read(1):
+            for i in range(12 if chroma_format == 3 else 8):
+                if reader.read(1):
+                    skip_scaling_list(reader, 16 if i < 6 else 64)
+    return reader.ue() + 4, separate_planes
+
+
+class AccessUnit:
+    __slots__ = ("nals", "size", "arrived_at", "completed_at", "keyframe", "has_sps", "has_slice",
+                 "frame_num", "reference", "corrupt")
+
+    def __init__(self, arrived_at):
+        self.nals = []
+        self.size = 0
+        self.arrived_at = arrived_at
+        self.completed_at = arrived_at
+        self.keyframe = False
+        self.has_sps = False
+        self.has_slice = False
+        self.frame_num = None
+        self.reference = False
+        self.corrupt = False
+
+    def data(self):
+        return b"".join(b"\x00" + START_CODE + nal for nal in self.nals)
+
+
+class AccessUnitAssembler:
+    # Splits the Annex B byte stream into NAL units and groups them into
+    # access units (one picture each). The Tello sends every picture as
+    # 1460 byte datagrams closed by a shorter one, so a short datagram ends
+    # the picture without waiting for the next start code. Parameter sets
+    # come in short datagrams of their own; they are held and sent along
+    # with the picture that follows.
+    def __init__(self, on_access_unit):
+        self.on_access_unit = on_access_unit
+        self.buffer = bytearray()
+        self.buffer_at = None
+        self.scan = 0
+        self.current = None
+        self.max_frame_num = None
+        self.separate_planes = 0
+        self.max_packet = 0
+
+    def feed(self, data, arrived_at):
+        if not self.buffer:
+            self.buffer_at = arrived_at
+        self.buffer += data
+        self.split(arrived_at)
+        self.max_packet = max(self.max_packet, len(data))
+        if len(data) < self.max_packet:
+            self.flush(arrived_at)
+
+    def split(self, arrived_at):
+        buffer = self.buffer
+        start = buffer.find(START_CODE)
+        if start == -1:
+            # Keep a possible partial start code at the end
+            self.scan = max(0, len(buffer) - 3)
+            return
+        while True:
+            end = buffer.find(START_CODE, max(start + 3, self.scan))
+            if end == -1:
+                break
+            nal = bytes(buffer[start + 3:end]).rstrip(b"\x00")
+            if nal:
+                self.push_nal(nal, self.buffer_at)
+            self.buffer_at = arrived_at
+            start = end
+        del buffer[:start]
+        self.scan = max(3, len(buffer) - 3)
+
+    def flush(self, arrived_at):
+        start = self.buffer.find(START_CODE)
+        if start != -1:
+            nal = bytes(self.buffer[start + 3:]).rstrip(b"\x00")
+            if nal:
+                self.push_nal(nal, self.buffer_at)
+        self.buffer.clear()
+        self.scan = 0
+        self.finish(arrived_at)
+
+    def push_nal(self, nal, arrived_at):
+        header = nal[0]
+        nal_type = header & 0x1F
+        unit = self.current
+        slice_start = False
+        if nal_type in (NAL_SLICE, NAL_IDR) and len(nal) > 1:
+            # first_mb_in_slice == 0 is a single 1 bit
+            slice_start = nal[1] & 0x80
+        if unit is not None and unit.has_slice and (slice_start or nal_type in (NAL_AUD, NAL_SPS, NAL_PPS, NAL_SEI)):
+            self.finish(arrived_at)
+            unit = None
+        if unit is None:
+            unit = self.current = AccessUnit(arrived_at)
+        if nal_type in (NAL_SLICE, NAL_IDR) and not slice_start and not unit.has_slice:
+            # The picture's first slice never arrived
+            unit.corrupt = True
+
+        unit.nals.append(nal)
+        unit.size += len(nal)
+        if header & 0x80:
+            # forbidden_zero_bit: the datagram carrying this NAL was damaged
+            unit.corrupt = True
+        elif nal_type == NAL_SPS:
+            unit.has_sps = True
+            try:
+                log2_max_frame_num, self.separate_planes = parse_sps(nal)
+                self.max_frame_num = 1 << log2_max_frame_num
+            except ValueError:
+                unit.corrupt = True
+        elif nal_type in (NAL_SLICE, NAL_IDR) and slice_start:
+            unit.has_slice = True
+            unit.keyframe = unit.keyframe or nal_type == NAL_IDR
+            unit.reference = bool(header & 0x60)
+            if self.max_frame_num:
+                try:
+                    reader = BitReader(nal[1:16])
+                    reader.ue()
+                    slice_type = reader.ue() % 5
+                    reader.ue()
+                    if self.separate_planes:
+                        reader.read(2)
+                    unit.frame_num = reader.read(self.max_frame_num.bit_length() - 1)
+                    # An intra picture sent with its parameter sets is a
+                    # clean entry point as well
+                    unit.keyframe = unit.keyframe or (unit.has_sps and slice_type == 2)
+                except ValueError:
+                    unit.corrupt = True
+        elif nal_type in (NAL_SLICE, NAL_IDR):
+            unit.has_slice = True
+
+    def finish(self, completed_at):
+        unit = self.current
+        if unit is None or not unit.has_slice:
+            # Only parameter sets or SEI so far: they belong to the next
+            # picture, which the decoder cannot read without them
+            return
+        self.current = None
+        unit.completed_at = completed_at
+        self.on_access_unit(unit)
+
+
+class H264Decoder:
+    def __init__(self):
+        import av
+        self.av = av
+        self.error = av.FFmpegError
+        self.context = None
+        self.reset()
+
+    def reset(self):
+        av = self.av
+        context = av.CodecContext.create("h264", "r")
+        # No frame reordering delay and no frame threading: each picture
+        # comes out of the decoder as soon as it goes in. A picture missing
+        # a datagram fails to decode instead of being concealed, which is
+        # how losses inside a picture are noticed.
+        context.options = {"err_detect": "explode"}
+        context.flags |= av.codec.context.Flags.low_delay
+        context.thread_type = "SLICE"
+        self.context = context
+
+    def decode(self, data):
+        return [frame.to_ndarray(format="bgr24") for frame in self.context.decode(self.av.Packet(data))]
+
+
+class H264Ingest:
+    # Takes the raw UDP datagrams of the drone's video stream (as a
+    # StreamRelay sink), rebuilds pictures and decodes them on one thread.
+    # Completed pictures wait up to `jitter` seconds to even out Wi-Fi
+    # bursts; if more than `max_frames` are waiting the backlog is decoded
+    # but only the newest picture is shown. After a lost or damaged
+    # picture everything is dropped until the next keyframe, so the
+    # display holds the last good frame instead of showing smeared ones.
+    def __init__(self, on_frame, jitter=0.02, max_frames=3, governor=None):
+        self.on_frame = on_frame
+        self.jitter = jitter
+        self.max_frames = max_frames
+        self.governor = governor
+
+        self.packets = deque()
+        self.packet_ready = Event()
+        self.units = deque()
+        self.assembler = AccessUnitAssembler(self.units.append)
+        self.decoder = None
+        self.running = False
+        self.thread = None
+
+        self.waiting_for_keyframe = True
+        self.last_ref_frame_num = None
+        self.last_completed_at = None
+        self.mean_interval = None
+        self.arrival_jitter = 0.0
+        self.latencies = deque(maxlen=200)
+
+        self.stats_packets = 0
+        self.stats_bytes = 0
+        self.frames = 0
+        self.decoded = 0
+        self.shown = 0
+        self.skipped = 0
+        self.discarded = 0
+        self.lost = 0
+        self.reordered = 0
+        self.corrupt = 0
+        self.decode_errors = 0
+
+        self.packet_counter = metrics.counter("video.ingest_packets")
+        self.loss_counter = metrics.counter("video.ingest_lost")
+        self.latency = metrics.histogram("video.ingest_ms")
+        self.frame_counter = metrics.counter("video.capture_frames")
+        self.decode_ms = metrics.histogram("video.decode_ms")
+
+    def feed(self, data):
+        # Runs on the network thread: timestamp and hand over, nothing more
+        self.packets.append((data, monotonic()))
+        self.packet_ready.set()
+
+    def prepare(self):
+        # Loads the decoder ahead of time; the first PyAV import is slow
+        if self.decoder is None:
+            self.decoder = H264Decoder()
+
+    def start(self):
+        if self.running:
+            return
+        self.prepare()
+        self.running = True
+        self.thread = Thread(target=self.run, daemon=True, name="video-ingest")
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.packet_ready.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def run(self):
+        packets = self.packets
+        while self.running:
+            timeout = self.next_release()
+            self.packet_ready.wait(timeout)
+            self.packet_ready.clear()
+            while packets:
+                data, arrived_at = packets.popleft()
+                self.stats_packets += 1
+                self.stats_bytes += len(data)
+                self.packet_counter.inc()
+                self.assembler.feed(data, arrived_at)
+            self.release(monotonic())
+
+    def next_release(self):
+        if not self.units:
+            return 0.1
+        return max(0.0, self.units[0].completed_at + self.jitter - monotonic())
+
+    def release(self, now):
+        units = self.units
+        ready = []
+        while units and (units[0].completed_at + self.jitter <= now or len(units) > self.max_frames):
+            ready.append(units.popleft())
+        for index, unit in enumerate(ready):
+            self.handle(unit, show=index == len(ready) - 1)
+
+    def handle(self, unit, show):
+        self.frames += 1
+        self.track_interval(unit)
+        if not self.in_sequence(unit):
+            self.lost += 1
+            self.loss_counter.inc()
+            self.resync()
+        if unit.corrupt:
+            self.corrupt += 1
+            self.resync()
+        if self.waiting_for_keyframe:
+            if not unit.keyframe:
+                self.discarded += 1
+                return
+            self.waiting_for_keyframe = False
+
+        start = thread_time()
+        try:
+            images = self.decoder.decode(unit.data())
+        except self.decoder.error as e:
+            self.decode_errors += 1
+            logger.debug(f"Decode error, waiting for keyframe: {e}")
+            self.decoder.reset()
+            self.resync()
+            return
+        elapsed = (thread_time() - start) * 1000
+        if self.governor is not None:
+            self.governor.record("decode", elapsed)
+        self.decode_ms.observe(elapsed)
+        if not images:
+            return
+        self.decoded += len(images)
+        if not show:
+            self.skipped += len(images)
+            return
+        self.shown += 1
+        self.frame_counter.inc()
+        self.on_frame(images[-1])
+        # From the picture's first datagram to the frame leaving the filter
+        latency = (monotonic() - unit.arrived_at) * 1000
+        self.latencies.append(latency)
+        self.latency.observe(latency)
+
+    def in_sequence(self, unit):
+        # Raw Annex B over UDP carries no sequence numbers; frame_num in the
+        # slice header advances by one per reference picture and stands in
+        frame_num = unit.frame_num
+        max_frame_num = self.assembler.max_frame_num
+        if frame_num is None or max_frame_num is None or unit.keyframe:
+            if unit.keyframe and unit.reference:
+                self.last_ref_frame_num = frame_num
+            return True
+        previous = self.last_ref_frame_num
+        if unit.reference:
+            self.last_ref_frame_num = frame_num
+        if previous is None:
+            return True
+        step = (frame_num - previous) % max_frame_num
+        if step in (0, 1):
+            return True
+        if step > max_frame_num // 2:
+            # Older than what was already decoded: late, not missing
+            self.reordered += 1
+            if unit.reference:
+                self.last_ref_frame_num = previous
+            return True
+        return False
+
+    def resync(self):
+        self.waiting_for_keyframe = True
+
+    def track_interval(self, unit):
+        # Interarrival jitter in the RFC 3550 style, against the running
+        # mean interval since there are no sender timestamps
+        if self.last_completed_at is not None:
+            interval = unit.completed_at - self.last_completed_at
+            if self.mean_interval is None:
+                self.mean_interval = interval
+            self.mean_interval += (interval - self.mean_interval) / 16
+            self.arrival_jitter += (abs(interval - self.mean_interval) - self.arrival_jitter) / 16
+        self.last_completed_at = unit.completed_at
+
+    def stats(self):
+        samples = sorted(self.latencies)
+        last = len(samples) - 1
+        return {
+            "packets": self.stats_packets,
+            "bytes": self.stats_bytes,
+            "frames": self.frames,
+            "decoded": self.decoded,
+            "shown": self.shown,
+            "skipped": self.skipped,
+            "discarded": self.discarded,
+            "lost": self.lost,
+            "reordered": self.reordered,
+            "corrupt": self.corrupt,
+            "decode_errors": self.decode_errors,
+            "buffered": len(self.units),
+            "jitter_ms": self.arrival_jitter * 1000,
+            "latency_p50_ms": samples[last // 2] if samples else None,
+            "latency_p95_ms": samples[last * 95 // 100] if samples else None,
+        }
@@ -0,0 +1,240 @@
+import os
+import csv
+import json
+import logging
+
+from collections import deque
+from threading import Thread, Event, Lock
+from time import monotonic, perf_counter, time
+
+logger = logging.getLogger(__name__)
+
+
+class NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_CONTEXT = NullContext()
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, registry, name, window=2.0):
+        self.registry = registry
+        self.name = name
+        self.window = window
+        # Plain += can lose the odd increment between threads; that is an
+        # acceptable error for diagnostics and keeps the hot path lock free
+        self.value = 0
+        self.marks = deque(maxlen=64)
+
+    def inc(self, amount=1):
+        if self.registry.enabled:
+            self.value += amount
+
+    def rate(self, now):
+        marks = self.marks
+        value = self.value
+        marks.append((now, value))
+        while len(marks) > 2 and now - marks[1][0] >= self.window:
+            marks.popleft()
+        start, start_value = marks[0]
+        return (value - start_value) / (now - start) if now > start else 0.0
+
+    def snapshot(self, now):
+        return {"count": self.value, "rate": self.rate(now)}
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.value = 0.0
+        self.peak = 0.0
+
+    def set(self, value):
+        if self.registry.enabled:
+            self.value = value
+            if value > self.peak:
+                self.peak = value
+
+    def snapshot(self, now):
+        # Peak is since startup; several readers snapshot independently
+        return {"value": self.value, "peak": self.peak}
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, registry, name, window=1024):
+        self.registry = registry
+        self.name = name
+        # Percentiles come from the most recent samples only, so they follow
+        # what is happening now rather than the whole session
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        if self.registry.enabled:
+            self.samples.append(value)
+            self.count += 1
+            self.total += value
+
+    def time(self):
+        # with histogram.time(): ... records the block in ms
+        if not self.registry.enabled:
+            return NULL_CONTEXT
+        return TimerContext(self)
+
+    def snapshot(self, now):
+        samples = sorted(self.samples)
+        if not samples:
+            return {"count": self.count}
+        last = len(samples) - 1
+        return {
+            "count": self.count,
+            "mean": sum(samples) / len(samples),
+            "p50": samples[last // 2],
+            "p95": samples[last * 95 // 100],
+            "max": samples[last],
+        }
+
+
+class TimerContext:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe((perf_counter() - self.start) * 1000)
+        return False
+
+
+class Metrics:
+    # Registry of named instruments. Instruments are created once and held by
+    # the code that updates them; while disabled every update is a single
+    # attribute check.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.instruments = {}
+        self.create_lock = Lock()
+        self.dumper = None
+
+    def get(self, cls, name):
+        instrument = self.instruments.get(name)
+        if instrument is None:
+            with self.create_lock:
+                instrument = self.instruments.get(name)
+                if instrument is None:
+                    instrument = cls(self, name)
+                    self.instruments[name] = instrument
+        return instrument
+
+    def counter(self, name):
+        return self.get(Counter, name)
+
+    def gauge(self, name):
+        return self.get(Gauge, name)
+
+    def histogram(self, name):
+        return self.get(Histogram, name)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+
+    def snapshot(self):
+        now = monotonic()
+        return {
+            name: dict(kind=instrument.kind, **instrument.snapshot(now))
+            for name, instrument in sorted(self.instruments.items())
+        }
+
+    def start_dump(self, path, interval=5.0):
+        self.stop_dump()
+        self.dumper = MetricsDumper(self, path, interval)
+        self.dumper.start()
+        return self.dumper
+
+    def stop_dump(self):
+        if self.dumper is not None:
+            self.dumper.stop()
+            self.dumper = None
+
+
+def format_snapshot(snapshot):
+    # Short lines for the video overlay
+    lines = []
+    for name, values in snapshot.items():
+        kind = values["kind"]
+        if kind == "counter":
+            lines.append(f"{name}: {values['rate']:.1f}/s")
+        elif kind == "gauge":
+            lines.append(f"{name}: {values['value']:.0f} (peak {values['peak']:.0f})")
+        elif "p50" in values:
+            lines.append(f"{name}: {values['p50']:.1f} / {values['p95']:.1f} / {values['max']:.1f}")
+    return lines
+
+
+class MetricsDumper:
+    # Appends a snapshot every interval seconds; .json writes one JSON object
+    # per line, anything else a long-format CSV
+    CSV_FIELDS = ("time", "name", "kind", "count", "rate", "value", "peak", "mean", "p50", "p95", "max")
+
+    def __init__(self, metrics, path, interval=5.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.json = path.endswith(".json") or path.endswith(".jsonl")
+        self.stopped = Event()
+        self.thread = None
+
+    def start(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.dump()
+        self.dump()
+
+    def dump(self):
+        snapshot = self.metrics.snapshot()
+        if not snapshot:
+            return
+        stamp = time()
+        try:
+            if self.json:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"time": stamp, "metrics": snapshot}) + "\n")
+            else:
+                new_file = not os.path.exists(self.path)
+                with open(self.path, "a", newline="", encoding="utf-8") as f:
+                    writer = csv.DictWriter(f, self.CSV_FIELDS)
+                    if new_file:
+                        writer.writeheader()
+                    for name, values in snapshot.items():
+                        writer.writerow(dict(time=f"{stamp:.3f}", name=name, **values))
+        except OSError as e:
+            logger.error(f"Error writing metrics dump: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+
+metrics = Metrics(enabled=os.environ.get("GCS_METRICS") == "1")
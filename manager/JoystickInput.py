@@ -0,0 +1,81 @@
+import os
+
+from typing import NamedTuple, Tuple, FrozenSet
+from time import monotonic
+
+# Imported on first use: pygame costs a few hundred ms at startup and is only
+# needed once someone looks for a joystick
+pygame = None
+
+
+def init_joystick_subsystem():
+    # Only SDL's joystick subsystem and the event queue it reports through;
+    # the dummy video driver provides the queue without opening a display.
+    # Must run on the thread that later samples the joystick.
+    global pygame
+    if pygame is None:
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        import pygame as module
+        module.display.init()
+        module.joystick.init()
+        pygame = module
+    return pygame
+
+
+def find_joystick():
+    # Pumping the queue lets SDL notice devices plugged in since the last look
+    sdl = init_joystick_subsystem()
+    sdl.event.pump()
+    if sdl.joystick.get_count() == 0:
+        return None
+    return sdl.joystick.Joystick(0)
+
+
+class JoystickSnapshot(NamedTuple):
+    seq: int
+    timestamp: float
+    axes: Tuple[float, ...]
+    buttons: Tuple[bool, ...]
+    pressed: FrozenSet[int]
+
+
+class JoystickInput:
+    def __init__(self, joystick):
+        self.joystick = joystick
+        self.instance_id = joystick.get_instance_id()
+        self.num_axes = joystick.get_numaxes()
+        self.num_buttons = joystick.get_numbuttons()
+        self.axis_range = range(self.num_axes)
+        self.button_range = range(self.num_buttons)
+        # Virtual joysticks report their own presses instead of SDL events
+        self.drain_presses = getattr(joystick, "drain_presses", self.drain_events)
+        self.connected = True
+
+        self.snapshot = JoystickSnapshot(
+            0, monotonic(), (0.0,) * self.num_axes, (False,) * self.num_buttons, frozenset()
+        )
+
+    def drain_events(self):
+        # Draining the queue pumps SDL once and yields every press since the
+        # last tick, including taps shorter than the tick itself
+        presses = []
+        for event in pygame.event.get():
+            if event.type == pygame.JOYBUTTONDOWN and event.instance_id == self.instance_id:
+                presses.append(event.button)
+            elif event.type == pygame.JOYDEVICEREMOVED and event.instance_id == self.instance_id:
+                self.connected = False
+        return presses
+
+    def sample(self):
+        pressed = self.drain_presses()
+
+        joystick = self.joystick
+        axes = tuple(joystick.get_axis(i) for i in self.axis_range)
+        buttons = tuple(bool(joystick.get_button(i)) for i in self.button_range)
+
+        # Publishing is a single reference swap; readers never see a partial sample
+        self.snapshot = JoystickSnapshot(
+            self.snapshot.seq + 1, monotonic(), axes, buttons, frozenset(pressed)
+        )
+        return self.snapshot
@@ -1,12 +1,93 @@
-from PySide6.QtGui import QTextCursor
+import os
+import logging
+
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from PySide6.QtCore import QTimer
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "drone_capture", "log")
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+logging_ready = False
+
+
+def setup_logging(level=logging.INFO, log_dir=LOG_DIR, max_bytes=2_000_000, backups=5):
+    # Everything goes to the console and a rotating file; the GUI adds its
+    # own handler on top
+    global logging_ready
+    if logging_ready:
+        return
+    logging_ready = True
+
+    os.makedirs(log_dir, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = RotatingFileHandler(
+        os.path.join(log_dir, "gcs.log"), maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+    )
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(file_handler)
+    root.addHandler(console_handler)
+
+
+class QueueHandler(logging.Handler):
+    # Producers only append to a bounded deque, which is atomic, so logging
+    # from any thread never waits on the GUI or on another producer
+    def __init__(self, max_pending=5000):
+        super().__init__()
+        self.pending = deque(maxlen=max_pending)
+        self.setFormatter(logging.Formatter("%(asctime)s %(message)s", "%H:%M:%S"))
+
+    def handle(self, record):
+        # Skips the per-handler lock logging.Handler would take
+        if self.filter(record):
+            self.emit(record)
+        return record
+
+    def emit(self, record):
+        try:
+            self.pending.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def drain(self):
+        pending = self.pending
+        lines = []
+        while pending:
+            lines.append(pending.popleft())
+        return lines
+
 
 class Log:
-    def __init__(self, log_text_edit):
-        self.log_text_edit = log_text_edit  
+    def __init__(self, log_text_edit, flush_interval=100, max_lines=1000, level=logging.INFO):
+        setup_logging()
+        self.log_text_edit = log_text_edit
+        # The view keeps the newest max_lines; older blocks are dropped by Qt
+        self.log_text_edit.setMaximumBlockCount(max_lines)
+        self.logger = logging.getLogger("gcs")
+
+        self.handler = QueueHandler()
+        self.handler.setLevel(level)
+        logging.getLogger().addHandler(self.handler)
+
+        # One widget update per interval, however many messages arrived
+        self.flush_timer = QTimer(log_text_edit)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start(flush_interval)
 
     def log_callback(self, message):
-        cursor = self.log_text_edit.textCursor()
-        cursor.movePosition(QTextCursor.Start) 
-        cursor.insertText("\n" + message) 
-        self.log_text_edit.setTextCursor(cursor)
-        self.log_text_edit.ensureCursorVisible()
\ No newline at end of file
+        # Callable from any thread
+        self.logger.info(message)
+
+    def flush(self):
+        lines = self.handler.drain()
+        if lines:
+            self.log_text_edit.appendPlainText("\n".join(lines))
+
+    def close(self):
+        self.flush_timer.stop()
+        logging.getLogger().removeHandler(self.handler)
@@ -1,185 +1,375 @@
 import os
 import sys
-import socket
 import random
 import string
-import cv2 as cv
+import logging
 
-from threading import Thread, Lock
-from time import sleep
+from threading import Thread
+from time import thread_time
 from datetime import datetime
 
+from manager.CommandChannel import CommandChannel
+from manager.CommandScheduler import CommandScheduler
+from manager.NetworkHub import get_default_hub
+from manager.DroneSession import DroneEndpoints
+from manager.FramePipeline import FramePipeline
+from manager.DisplayGovernor import DisplayGovernor
+from manager.FrameProcessor import FrameProcessor
+from manager.FrameQueue import FrameQueue, DROP_OLDEST
+from manager.StreamRelay import StreamRelay
+from manager.Recorder import PASSTHROUGH
+from manager.SegmentedRecorder import SegmentedRecorder
+from manager.PrerollBuffer import PrerollBuffer
+from manager.H264Ingest import H264Ingest, ingest_available
+from manager.PhotoCapture import PhotoCapture
+from manager.OpenCVLoader import load_opencv
+from manager.Telemetry import TelemetryState, parse_state
+from manager.FlightRecorder import FlightRecorder, LOG_DIR
+from manager.TimedLock import TimedLock
+from manager.Instrumentation import metrics
+from manager.StartupProfile import startup
+
 os.environ["OPENCV_FFMPEG_LOGLEVEL"] = "quiet"
-os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "loglevel;error"
+# Fallback decoder when PyAV is missing: no demuxer buffering, and a UDP
+# read timeout (microseconds) so the decode thread notices a stop request
+# even when the stream has gone silent
+os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "loglevel;error|timeout;2000000|fflags;nobuffer|flags;low_delay"
 
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manager'))
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'drone_capture'))
 
+logger = logging.getLogger(__name__)
+
 class MetricsSystem:
-    def __init__(self, log_action=None, apply_filter=None):
+    def __init__(self, endpoints=None, hub=None, apply_filter=None, frame_queue_policy=DROP_OLDEST,
+                 recording_mode=PASSTHROUGH, recording_container="mp4", decode_in_process=False,
+                 jitter_buffer=0.02, segment_duration=60.0, preroll=5.0, log_dir=LOG_DIR):
         self.apply_filter = apply_filter
-        self.addr = ("192.168.10.1", 8889)
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.bind(("", 9000))
+        self.display_governor = DisplayGovernor()
+        self.frame_processor = FrameProcessor(apply_filter, self.display_governor)
+        # One session per drone; sessions sharing a hub share its network
+        # thread and worker pool. Point endpoints at a DroneSimulator to run
+        # without hardware.
+        self.endpoints = endpoints or DroneEndpoints()
+        self.hub = hub or get_default_hub()
+        self.addr = self.endpoints.command_addr
+        self.command_rtt = metrics.histogram("command.rtt_ms")
+        self.command_channel = CommandChannel(
+            self.addr, self.endpoints.local_port, latency_callback=self.record_latency, hub=self.hub
+        )
+        # Everything sent to the drone goes through the scheduler
+        self.command_scheduler = CommandScheduler(self.command_channel)
+        self.state_port = None
         
-        self.state = {}
-        self.lock = Lock()
+        self.telemetry = TelemetryState()
+        self.telemetry_gap_ms = None
+        self.telemetry_listeners = ()
+        self.flight_recorder = FlightRecorder(log_dir=log_dir, name=self.endpoints.name)
+        self.record_lock = TimedLock("record")
         
-        self.current_frame = None
+        self.frame_pipeline = FramePipeline(governor=self.display_governor)
+        self.frame_processor.subscribe(self.display_frame)
+        self.stream_relay = StreamRelay(self.endpoints.video_port, host=self.endpoints.host, hub=self.hub)
+        # Always holds the last `preroll` seconds of the stream, so starting
+        # a passthrough recording also captures what led up to it
+        self.preroll = PrerollBuffer(preroll)
+        self.stream_relay.add_sink(self.preroll.on_packet)
+        self.decode_in_process = decode_in_process
+        self.decode_worker = None
+        self.jitter_buffer = jitter_buffer
+        self.video_ingest = None
+        self.filter_name = "normal"
+        self.processing_preset = "full"
         self.video_stream_active = False
+        self.video_thread = None
         self.recording = False
-        self.video_writer = None
-        self.frame_queue = []
+        self.recorder = None
+        self.recording_in_worker = False
+        self.recording_mode = recording_mode
+        self.recording_container = recording_container
+        self.segment_duration = segment_duration
+        self.finishing_recorder = None
         self.max_frame_queue_size = 10
+        self.frame_queue = FrameQueue(self.max_frame_queue_size, frame_queue_policy)
+        self.frame_queue_depth = metrics.gauge("record.queue_depth")
         self.record_thread = None
         
-        self.log_action = log_action
+        self.photo_capture = PhotoCapture(os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", "drone_capture", "img"
+        ), pool=self.hub.pool)
     
         self.paused = False
         self.video_path = None
 
+    def connect(self):
+        # The handshake overlaps with local set-up: sockets, the decoder and
+        # its library import are ready by the time the drone answers
+        def prepare():
+            with startup.span("video set-up"):
+                self.prepare_video_stream()
+
+        self.start_telemetry()
+        prepared = self.hub.submit(prepare)
+        with startup.span("sdk handshake"):
+            connected = self.init_sdk_mode()
+        try:
+            prepared.result()
+        except Exception as e:
+            logger.error(f"Video set-up failed: {e}")
+        if not connected:
+            return False
+        # Without video the session is not usable; False lets the caller
+        # retry the whole handshake
+        with startup.span("stream start"):
+            return self.start_video_stream()
+
     def init_sdk_mode(self):
         data = self.send_msg("command")
         if data == "ok":
-            print("Entering SDK Mode")
+            logger.info(f"Entering SDK Mode on {self.endpoints.label}")
+            if self.endpoints.custom_ports:
+                reply = self.send_msg(f"port {self.endpoints.state_port} {self.endpoints.video_port}")
+                if reply != "ok":
+                    logger.error(f"Drone refused state/video ports: {reply}")
             return True
         else:
-            print("Error initiating SDK Mode")
+            logger.error("Error initiating SDK Mode")
             return False
         
-    def send_msg(self, command):
-        try:
-            self.sock.sendto(command.encode(), self.addr)
-            data, _ = self.sock.recvfrom(1024)
-            return data.decode()
-        except socket.error as e:
-            print(f"Socket error: {e}")
-            return "error"
-
-    def receive_state(self):
-        try:
-            serv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            serv_sock.bind(("", 8890))
-            while True:
-                try:
-                    state_data, _ = serv_sock.recvfrom(1024)
-                    self.parse_state_data(state_data.decode("utf-8"))
-                except Exception as e:
-                    print(f"Error receiving state: {e}")
-                    break
-        finally:
-            serv_sock.close()
+    def send_msg(self, command, timeout=None):
+        return self.command_scheduler.send(command, timeout)
 
-    def parse_state_data(self, state_str):
-        try:
-            data_dict = {}
-            for item in state_str.split(";"):
-                if ":" in item:
-                    key, value = item.split(":", 1)
-                    data_dict[key.strip()] = value.strip()
-
-            with self.lock:
-                self.state["battery"] = data_dict.get("bat", "Unknown")
-                self.state["temperature"] = self.calculate_temperature(
-                    data_dict.get("templ", 0), data_dict.get("temph", 0)
-                )
-                self.state["speed"] = self.calculate_speed(
-                    data_dict.get("vgx", 0), data_dict.get("vgy", 0), data_dict.get("vgz", 0)
-                )
-                self.state.update({
-                    "altitude": data_dict.get("h", "Unknown"),
-                    "barometer": data_dict.get("baro", "Unknown"),
-                    "pitch": data_dict.get("pitch", "Unknown"),
-                    "roll": data_dict.get("roll", "Unknown"),
-                    "yaw": data_dict.get("yaw", "Unknown"),
-                    "flight_time": data_dict.get("time", "Unknown"),
-                })
+    def send_msg_async(self, command, callback=None, timeout=None):
+        return self.command_scheduler.send_async(command, timeout, callback)
 
-        except Exception as e:
-            print(f"Error parsing state data: {e}")
-              
-    @staticmethod
-    def calculate_temperature(templ, temph):
-        try:
-            return f"{(float(templ) + float(temph)) / 2:.1f}"
-        except ValueError:
-            return "Unknown"
+    def send_msg_nowait(self, command):
+        self.command_scheduler.send_nowait(command)
+
+    def record_latency(self, command, latency):
+        self.command_rtt.observe(latency * 1000)
+
+    def get_command_latency(self):
+        return self.command_channel.get_latency_stats()
+
+    def get_command_queue_stats(self):
+        return self.command_scheduler.stats()
+
+    def get_telemetry_latency(self):
+        return self.telemetry_gap_ms
 
-    @staticmethod
-    def calculate_speed(vgx, vgy, vgz):
+    def start_telemetry(self):
+        # State packets are routed here by the hub from this drone's address
+        if self.state_port is not None:
+            return
+        self.telemetry_packets = metrics.counter("telemetry.packets")
+        self.state_port = self.hub.open(self.endpoints.state_port)
+        self.hub.register(self.state_port, self.endpoints.host, self.on_state_packet)
+
+    def stop_telemetry(self):
+        if self.state_port is None:
+            return
+        self.hub.unregister(self.state_port, self.endpoints.host)
+        self.hub.close(self.state_port)
+        self.state_port = None
+
+    def subscribe_telemetry(self, callback):
+        # Listeners run on the network thread for every packet and must not block
+        self.telemetry_listeners = self.telemetry_listeners + (callback,)
+
+    def unsubscribe_telemetry(self, callback):
+        self.telemetry_listeners = tuple(c for c in self.telemetry_listeners if c != callback)
+
+    def on_state_packet(self, data, addr):
+        self.telemetry_packets.inc()
+        self.parse_state_data(data.decode("utf-8", errors="replace"))
+
+    def parse_state_data(self, state_str):
         try:
-            return f"{(abs(float(vgx)) + abs(float(vgy)) + abs(float(vgz))) / 3:.1f}"
-        except ValueError:
-            return "Unknown"
+            # Single reference swap; readers never see a half-parsed packet
+            previous = self.telemetry
+            state = parse_state(state_str, previous.seq + 1)
+            self.telemetry = state
+            if previous.seq:
+                # A starved receive thread shows up as a long gap followed by a
+                # burst, so keep a slowly decaying peak rather than an average
+                gap = (state.timestamp - previous.timestamp) * 1000
+                self.telemetry_gap_ms = max(gap, (self.telemetry_gap_ms or 0.0) * 0.95)
+            self.flight_recorder.append(state)
+        except Exception as e:
+            logger.warning(f"Error parsing state data: {e}")
+            return
+        for callback in self.telemetry_listeners:
+            callback(state)
         
     def update_telemetry_metrics(self):
-        with self.lock:
-            return self.state.copy()
+        return self.telemetry
 
 # VIDEO STREAM
+    def prepare_video_stream(self):
+        # Everything that does not need the drone. OpenCV is left out of
+        # the startup imports and loaded here, off the GUI thread, before
+        # the first frame needs it.
+        load_opencv()
+        self.stream_relay.start()
+        if self.decode_in_process or self.video_ingest is not None or not ingest_available():
+            return
+        ingest = H264Ingest(self.frame_processor.process, self.jitter_buffer, governor=self.display_governor)
+        ingest.prepare()
+        self.video_ingest = ingest
+
     def start_video_stream(self):
+        self.prepare_video_stream()
+        ingest = self.video_ingest
+        if ingest is not None:
+            # Reassembly, jitter buffer and a low-delay decoder of our own;
+            # listening before streamon so the first keyframe is not missed
+            self.stream_relay.forwarding = False
+            self.stream_relay.add_sink(ingest.feed)
+            ingest.start()
+
         data = self.send_msg("streamon")
         if data == "ok":
-            thread = Thread(target=self.video_stream)
+            if self.decode_in_process:
+                from manager.DecodeWorker import DecodeWorker
+                # Decoding, filtering and frame recording move to a child
+                # process; this side only copies finished frames out of
+                # shared memory
+                self.frame_processor.apply_filter = None
+                self.decode_worker = DecodeWorker()
+                self.decode_worker.start(self.stream_relay.decoder_url, self.filter_name)
+                self.decode_worker.set_processing(self.processing_preset)
+                thread = Thread(target=self.worker_stream, daemon=True)
+            elif ingest is not None:
+                self.video_stream_active = True
+                return True
+            else:
+                thread = Thread(target=self.video_stream, daemon=True)
+            self.video_stream_active = True
+            self.video_thread = thread
             thread.start()
             return True
         else:
-            print("Error starting video stream")
+            logger.error("Error starting video stream")
+            self.stop_video_stream()
             return False
 
+    def stop_video_stream(self):
+        self.video_stream_active = False
+        ingest, self.video_ingest = self.video_ingest, None
+        if ingest is not None and ingest.running:
+            self.stream_relay.remove_sink(ingest.feed)
+            ingest.stop()
+            self.stream_relay.forwarding = True
+            stats = ingest.stats()
+            logger.info(
+                f"Video ingest: {stats['shown']} of {stats['frames']} pictures shown, {stats['lost']} lost, "
+                f"{stats['reordered']} reordered, {stats['decode_errors']} damaged"
+            )
+        thread, self.video_thread = self.video_thread, None
+        if thread is not None:
+            self.stream_relay.stop()
+            thread.join(timeout=5)
+        if self.decode_worker:
+            self.decode_worker.stop()
+            self.decode_worker = None
+
+    def get_video_stats(self):
+        ingest = self.video_ingest
+        return ingest.stats() if ingest is not None else None
+
     def video_stream(self):
-        cap = cv.VideoCapture("udp://@0.0.0.0:11111")
+        cv = load_opencv()
+        cap = cv.VideoCapture(self.stream_relay.decoder_url)
         if not cap.isOpened():
-            print("Error: Could not open video stream.")
+            logger.error("Could not open video stream")
             return
-        self.video_stream_active = True
 
+        governor = self.display_governor
+        frames = metrics.counter("video.capture_frames")
+        decode_ms = metrics.histogram("video.decode_ms")
         while self.video_stream_active:
+            # CPU time rather than wall time, so waiting on the network does
+            # not count as decode cost
+            start = thread_time()
             ret, img = cap.read()
+            elapsed = (thread_time() - start) * 1000
+            governor.record("decode", elapsed)
             if ret:
-                img = cv.resize(img, (640, 480))
-                with self.lock:
-                    self.current_frame = img
-                if self.recording and not self.paused:
-                    if len(self.frame_queue) < self.max_frame_queue_size:
-                        self.frame_queue.append(img)
-                    else:
-                        sleep(0.05)
-            else:
-                self.current_frame = None
+                frames.inc()
+                decode_ms.observe(elapsed)
+                self.frame_processor.process(img)
 
         cap.release()
 
-    def stop_video_stream(self):
-        self.send_msg("streamoff")
+    def worker_stream(self):
+        worker = self.decode_worker
 
-    def take_photo(self):
-        img = self.get_current_frame()
-        if img is not None:
-            if self.apply_filter:
-                img = self.apply_filter(img)  
+        governor = self.display_governor
+        frames = metrics.counter("video.capture_frames")
+        copy_ms = metrics.histogram("video.shm_copy_ms")
+        while self.video_stream_active and worker.is_alive():
+            start = thread_time()
+            img = worker.read_frame()
+            elapsed = (thread_time() - start) * 1000
+            governor.record("decode", elapsed)
+            if img is not None:
+                frames.inc()
+                copy_ms.observe(elapsed)
+            for message in worker.poll_messages():
+                self.handle_worker_message(message)
+            if img is not None:
+                self.frame_processor.process(img)
 
-            base_dir = os.path.join(
-                os.path.dirname(os.path.abspath(__file__)), "..", "drone_capture", "img"
-            )
-            if not os.path.exists(base_dir):
-                os.makedirs(base_dir)
-
-            date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-            random_str = "".join(random.choices(string.ascii_letters + string.digits, k=2))
-            filename = f"{date_str}_{random_str}.jpg"
-            photo_path = os.path.join(base_dir, filename)
-            cv.imwrite(photo_path, img)
-
-            log_msg = f"Photo taken and saved to {photo_path}"
-            print(log_msg)
-            if self.log_action:
-                self.log_action(log_msg)  
+        for message in worker.poll_messages():
+            self.handle_worker_message(message)
+
+    def handle_worker_message(self, message):
+        if message[0] == "error":
+            logger.error(f"Decode worker: {message[1]}")
+        elif message[0] == "recorded" and message[2]:
+            logger.warning(f"Recorder dropped {message[2]} writes")
+
+    def display_frame(self, frame):
+        # The display gets its own single resize + RGB conversion from
+        # the full-resolution frame, off the GUI thread
+        self.frame_pipeline.publish(frame.image)
+
+    def queue_for_recording(self, frame):
+        if not self.paused:
+            self.frame_queue.put(frame)
+            self.frame_queue_depth.set(len(self.frame_queue))
+
+    def set_apply_filter(self, apply_filter):
+        self.apply_filter = apply_filter
+        # Frames from the decode worker already carry the filter
+        if not self.decode_in_process:
+            self.frame_processor.apply_filter = apply_filter
+
+    def set_filter(self, filter_name):
+        self.filter_name = filter_name
+        if self.decode_worker:
+            self.decode_worker.set_filter(filter_name)
+
+    def set_processing(self, preset):
+        self.processing_preset = preset
+        if self.decode_worker:
+            self.decode_worker.set_processing(preset)
+
+    def take_photo(self, raw=False):
+        # Safe to call from the control loop: only the frame reference is
+        # taken here, encoding and the write happen on the photo pool
+        return self.photo_capture.capture(self.frame_processor.latest, raw, self.photo_saved)
+
+    def take_burst(self, count=5, interval=0.2, raw=False):
+        return self.photo_capture.burst(
+            lambda: self.frame_processor.latest, count, interval, raw, self.photo_saved
+        )
+
+    def photo_saved(self, path, error):
+        if error:
+            logger.error(f"Failed to capture photo: {error}")
         else:
-            error_msg = "Failed to capture photo"
-            print(error_msg)
-            if self.log_action:
-                self.log_action(error_msg) 
+            logger.info(f"Photo taken and saved to {path}")
 
     def start_recording(self):
         base_dir = os.path.join(
@@ -190,66 +380,132 @@ class MetricsSystem:
 
         date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
         random_str = "".join(random.choices(string.ascii_letters + string.digits, k=2))
-        video_filename = f"{date_str}_{random_str}.mp4"
-        self.video_path = os.path.join(base_dir, video_filename) 
-        self.video_writer = cv.VideoWriter(
-            self.video_path, cv.VideoWriter_fourcc(*"mp4v"), 20.0, (640, 480)
-        )
-        self.recording = True
-        self.paused = False
+        # Each recording is a directory of segments plus their index
+        video_path = os.path.join(base_dir, f"{date_str}_{random_str}")
 
-        if self.record_thread is None or not self.record_thread.is_alive():
-            self.record_thread = Thread(target=self.record_video, daemon=True)
-            self.record_thread.start()
+        # The lock only covers the state flip; spawning the encoder and
+        # everything it does afterwards stays outside
+        with self.record_lock:
+            if self.recording:
+                return
+            self.recording = True
+            self.paused = False
+            self.video_path = video_path
+        self.frame_queue.clear()
+
+        if self.decode_worker and self.recording_mode != PASSTHROUGH:
+            # Frame-based recording stays next to the decoder in the worker
+            self.decode_worker.start_recording(
+                self.recording_mode, video_path, self.recording_container, self.segment_duration
+            )
+            self.recording_in_worker = True
+        else:
+            recorder = SegmentedRecorder(
+                self.recording_mode, video_path, self.recording_container, self.segment_duration
+            )
+            recorder.start()
 
-        log_msg = f"Video started, saving to {self.video_path}"
-        print(log_msg)
-        if self.log_action:
-            self.log_action(log_msg)
+            if recorder.wants_packets:
+                # Replays the pre-roll, then passes on each new packet
+                self.preroll.attach(recorder.write_packet)
 
-    def record_video(self):
+            if recorder.wants_frames:
+                self.record_thread = Thread(target=self.record_video, args=(recorder,), daemon=True)
+                self.record_thread.start()
+                self.frame_processor.subscribe(self.queue_for_recording)
+            self.recorder = recorder
+
+        logger.info(f"Video started, saving to {video_path}")
+
+    def record_video(self, recorder):
         while self.recording:
-            with self.lock:
-                if not self.paused and len(self.frame_queue) > 0:
-                    frame = self.frame_queue.pop(0)
-                    if frame is not None:
-                        if self.apply_filter:
-                            frame = self.apply_filter(frame)  
-                        self.video_writer.write(frame)
-            sleep(0.05)
+            # Sleeps until the capture thread hands over a frame
+            frame = self.frame_queue.get(timeout=0.5)
+            if frame is None or self.paused:
+                continue
+            recorder.write_frame(frame.image)
             
     def stop_recording(self):
-        self.recording = False
-        if self.video_writer:
-            self.video_writer.release()
-            log_msg = f"Video recording stopped. Video saved at: {self.video_path}"
-            print(log_msg)
-            if self.log_action:
-                self.log_action(log_msg) 
-
-        if self.record_thread:
-            self.record_thread.join()
-        self.record_thread = None
+        with self.record_lock:
+            if not self.recording:
+                return
+            self.recording = False
+            recorder, self.recorder = self.recorder, None
+            record_thread, self.record_thread = self.record_thread, None
+            in_worker, self.recording_in_worker = self.recording_in_worker, False
+
+        self.frame_processor.unsubscribe(self.queue_for_recording)
+        self.frame_queue.wake()
+        if record_thread:
+            record_thread.join()
+
+        if in_worker:
+            self.decode_worker.stop_recording()
+
+        if recorder:
+            if recorder.wants_packets:
+                self.preroll.detach()
+            # Closing the last segment carries on in the background
+            recorder.stop()
+            self.finishing_recorder = recorder
+            if recorder.dropped:
+                logger.warning(f"Recorder dropped {recorder.dropped} writes")
+
+            stats = self.frame_queue.stats()
+            if stats["dropped"]:
+                logger.warning(f"Recording dropped {stats['dropped']} of {stats['enqueued'] + stats['dropped']} frames")
+        self.frame_queue.clear()
+
+        logger.info(f"Video recording stopped. Segments saved in: {self.video_path}")
+
+    def wait_for_recording(self, timeout=None):
+        # Blocks until the last stopped recording's segments are all closed
+        recorder = self.finishing_recorder
+        if recorder is not None:
+            recorder.wait(timeout)
 
     def pause_recording(self):
-        with self.lock:
+        with self.record_lock:
             self.paused = True
-        print("Recording paused")
+            recorder = self.recorder
+            in_worker = self.recording_in_worker
+        if recorder:
+            recorder.pause()
+        if in_worker:
+            self.decode_worker.pause_recording()
+        logger.info("Recording paused")
 
     def resume_recording(self):
-        with self.lock:
+        with self.record_lock:
             self.paused = False
-        print("Recording resumed")
+            recorder = self.recorder
+            in_worker = self.recording_in_worker
+        if recorder:
+            recorder.resume()
+        if in_worker:
+            self.decode_worker.resume_recording()
+        logger.info("Recording resumed")
+
+    def get_lock_stats(self):
+        return {
+            "record": self.record_lock.stats(),
+            "frame_pipeline": self.frame_pipeline.slot_lock.stats(),
+        }
 
     def stop_drone_operations(self):
         data = self.send_msg("land")
-        print("Response:", data)
-        self.video_stream_active = False
-        if self.sock:
-            self.sock.close()
-        if hasattr(self, "state_socket") and self.state_socket:
-            self.state_socket.close()
+        logger.info(f"Land response: {data}")
+        self.stop_recording()
+        self.stop_video_stream()
+        self.stream_relay.stop()
+        self.photo_capture.shutdown()
+        self.stop_telemetry()
+        self.flight_recorder.close()
+        self.command_channel.close()
+        self.wait_for_recording(timeout=10)
 
     def get_current_frame(self):
-        with self.lock:
-            return self.current_frame
+        frame = self.frame_processor.latest
+        if frame is None:
+            return None
+        return frame.scaled((640, 480))
@@ -0,0 +1,221 @@
+import socket
+import asyncio
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock, Event, get_ident
+
+logger = logging.getLogger(__name__)
+
+ANY_HOST = None
+
+
+class Timer:
+    __slots__ = ("callback", "cancelled")
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        # Safe from any thread; the loop simply skips the callback
+        self.cancelled = True
+
+    def run(self):
+        if not self.cancelled:
+            self.callback()
+
+
+class HubProtocol(asyncio.DatagramProtocol):
+    # One per local port. Datagrams go to the handler registered for the
+    # sender's host; while the socket buffer is full droppable sends (rc
+    # packets, relayed video) are discarded instead of queued.
+    def __init__(self, hub, port):
+        self.hub = hub
+        self.port = port
+        self.transport = None
+        self.writable = True
+        self.dropped = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        routes = self.hub.routes
+        handler = routes.get((self.port, addr[0])) or routes.get((self.port, ANY_HOST))
+        if handler is None:
+            return
+        try:
+            handler(data, addr)
+        except Exception as e:
+            logger.error(f"Handler error on port {self.port}: {e}")
+
+    def error_received(self, exc):
+        # e.g. ICMP port unreachable when nothing listens on the other side
+        logger.debug(f"Socket error on port {self.port}: {exc}")
+
+    def pause_writing(self):
+        self.writable = False
+
+    def resume_writing(self):
+        self.writable = True
+
+    def send(self, data, addr, droppable):
+        if self.transport is None or self.transport.is_closing():
+            return
+        if not self.writable and droppable:
+            self.dropped += 1
+            return
+        self.transport.sendto(data, addr)
+
+
+class NetworkHub:
+    # One asyncio event loop on a background thread carries the UDP traffic of
+    # every drone session, plus a worker pool for anything that may block.
+    # Each local port is a single datagram endpoint; datagrams are routed to
+    # the handler registered for (port, source host), so any number of drones
+    # can share the command, state and video ports. Handlers and timer
+    # callbacks run on the loop and must not block.
+    def __init__(self, workers=4):
+        self.protocols = {}
+        self.users = {}
+        self.routes = {}
+        self.lock = Lock()
+
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gcs-pool")
+        self.loop = asyncio.new_event_loop()
+        self.started = Event()
+        self.thread = Thread(target=self.run, daemon=True, name="gcs-network")
+        self.thread.start()
+        self.started.wait()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self.started.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+
+    def in_loop(self):
+        return get_ident() == self.thread.ident
+
+    def open(self, port, recv_buffer=None):
+        # Endpoints are shared and reference counted; port 0 picks a free one
+        if self.in_loop():
+            raise RuntimeError("NetworkHub.open must not be called from the network thread")
+        with self.lock:
+            if port in self.protocols:
+                self.users[port] += 1
+                return port
+
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if recv_buffer:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
+            sock.bind(("", port))
+            port = sock.getsockname()[1]
+            protocol = HubProtocol(self, port)
+            self.run_coroutine(
+                self.loop.create_datagram_endpoint(lambda: protocol, sock=sock)
+            ).result(timeout=5)
+            self.protocols[port] = protocol
+            self.users[port] = 1
+            return port
+
+    def close(self, port):
+        with self.lock:
+            self.users[port] -= 1
+            if self.users[port]:
+                return
+            del self.users[port]
+            protocol = self.protocols.pop(port)
+            self.routes = {key: h for key, h in self.routes.items() if key[0] != port}
+        if protocol.transport is not None:
+            self.loop.call_soon_threadsafe(protocol.transport.close)
+
+    def register(self, port, host, handler):
+        # host ANY_HOST catches datagrams no other route claims
+        with self.lock:
+            routes = dict(self.routes)
+            routes[(port, host)] = handler
+            self.routes = routes
+
+    def unregister(self, port, host):
+        with self.lock:
+            routes = dict(self.routes)
+            routes.pop((port, host), None)
+            self.routes = routes
+
+    def sendto(self, port, data, addr, droppable=False):
+        # Callable from any thread; the send itself always happens on the loop
+        protocol = self.protocols.get(port)
+        if protocol is None:
+            logger.error(f"Send on closed port {port}")
+            return False
+        if self.in_loop():
+            protocol.send(data, addr, droppable)
+        else:
+            self.loop.call_soon_threadsafe(protocol.send, data, addr, droppable)
+        return True
+
+    def call_soon(self, callback):
+        if self.in_loop():
+            callback()
+        else:
+            self.loop.call_soon_threadsafe(callback)
+
+    def call_later(self, delay, callback):
+        timer = Timer(callback)
+        if self.in_loop():
+            self.loop.call_later(delay, timer.run)
+        else:
+            self.loop.call_soon_threadsafe(self.loop.call_later, delay, timer.run)
+        return timer
+
+    def run_coroutine(self, coro):
+        # Returns a concurrent.futures.Future for callers outside the loop
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def submit(self, fn, *args):
+        return self.pool.submit(fn, *args)
+
+    def dropped(self):
+        return {port: protocol.dropped for port, protocol in self.protocols.items()}
+
+    def shutdown(self):
+        with self.lock:
+            protocols = list(self.protocols.values())
+            self.protocols.clear()
+            self.users.clear()
+            self.routes = {}
+
+        async def stop():
+            for protocol in protocols:
+                if protocol.transport is not None:
+                    protocol.transport.close()
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self.loop.is_running():
+            try:
+                self.run_coroutine(stop()).result(timeout=2)
+            except Exception as e:
+                logger.debug(f"Network shutdown: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=2)
+        self.pool.shutdown(wait=False)
+
+
+default_hub = None
+default_hub_lock = Lock()
+
+
+def get_default_hub():
+    global default_hub
+    with default_hub_lock:
+        if default_hub is None:
+            default_hub = NetworkHub()
+        return default_hub
@@ -0,0 +1,12 @@
+# Imported on first use: OpenCV adds noticeably to startup and is only
+# needed once frames arrive. prepare_video_stream loads it off the GUI thread
+# ahead of the first frame; everything else takes the loaded module from here.
+cv = None
+
+
+def load_opencv():
+    global cv
+    if cv is None:
+        import cv2 as module
+        cv = module
+    return cv
@@ -0,0 +1,107 @@
+import os
+import random
+import string
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Condition, Thread, Event
+
+from manager.OpenCVLoader import load_opencv
+
+PHOTO_SIZE = (640, 480)
+
+
+class PhotoCapture:
+    # The caller only hands over a ProcessedFrame reference, which is never
+    # written to again; scaling, encoding and the disk write happen on the pool
+    def __init__(self, base_dir, workers=2, size=PHOTO_SIZE, jpeg_quality=95, max_pending=32, pool=None):
+        self.base_dir = base_dir
+        self.size = size
+        self.jpeg_quality = jpeg_quality
+        self.max_pending = max_pending
+        # A shared pool (e.g. the NetworkHub's) is used but never shut down here
+        self.owns_pool = pool is None
+        self.pool = pool or ThreadPoolExecutor(max_workers=workers, thread_name_prefix="photo")
+        self.pending = 0
+        self.pending_lock = Condition()
+        self.stopping = Event()
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def photo_stem(self):
+        date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        random_str = "".join(random.choices(string.ascii_letters + string.digits, k=2))
+        return f"{date_str}_{random_str}"
+
+    def capture(self, frame, raw=False, callback=None, stem=None):
+        # Returns the future, or None if the frame was refused
+        if frame is None:
+            if callback:
+                callback(None, "no frame available")
+            return None
+        with self.pending_lock:
+            if self.pending >= self.max_pending:
+                refused = True
+            else:
+                refused = False
+                self.pending += 1
+        if refused:
+            if callback:
+                callback(None, "too many photos pending")
+            return None
+        extension = "png" if raw else "jpg"
+        path = os.path.join(self.base_dir, f"{stem or self.photo_stem()}.{extension}")
+        return self.pool.submit(self.save, frame, path, raw, callback)
+
+    def save(self, frame, path, raw, callback):
+        cv = load_opencv()
+        error = None
+        try:
+            if raw:
+                # Full resolution, lossless
+                written = cv.imwrite(path, frame.image)
+            else:
+                image = frame.scaled(self.size)
+                written = cv.imwrite(path, image, [cv.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not written:
+                error = "could not encode or write image"
+        except Exception as e:
+            error = str(e)
+        finally:
+            with self.pending_lock:
+                self.pending -= 1
+                self.pending_lock.notify_all()
+        if callback:
+            callback(None if error else path, error)
+        return path if error is None else None
+
+    def burst(self, get_frame, count=5, interval=0.2, raw=False, callback=None):
+        # Grabs count frames interval seconds apart on a timer thread; the
+        # same frame is never saved twice if the stream stalls, and all
+        # frames share one name so they sort in capture order
+        stem = self.photo_stem()
+
+        def run():
+            last_seq = None
+            for index in range(count):
+                if index and self.stopping.wait(interval):
+                    break
+                frame = get_frame()
+                if frame is not None and frame.seq == last_seq:
+                    if callback:
+                        callback(None, "stream stalled, frame skipped")
+                    continue
+                last_seq = frame.seq if frame is not None else None
+                self.capture(frame, raw, callback, f"{stem}_b{index + 1:02}")
+
+        thread = Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        # Queued photos are still written before returning
+        self.stopping.set()
+        if self.owns_pool:
+            self.pool.shutdown(wait=True)
+        else:
+            with self.pending_lock:
+                self.pending_lock.wait_for(lambda: self.pending == 0, timeout=10)
@@ -0,0 +1,57 @@
+from collections import deque
+from threading import Lock
+from time import monotonic
+
+from manager.Recorder import contains_keyframe
+
+
+class PrerollBuffer:
+    # Keeps the last `seconds` of the drone's H.264 stream, so a recording
+    # started now can begin a little in the past. Packets are held as whole
+    # GOPs, each starting at a keyframe, so what is replayed always decodes.
+    # Sits between the StreamRelay and the recorder: once a sink is attached
+    # it gets the buffered packets and then every new one, with nothing lost
+    # or repeated in between.
+    def __init__(self, seconds=5.0, max_bytes=16 << 20):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.gops = deque()
+        self.bytes = 0
+        self.sink = None
+        self.lock = Lock()
+
+    def on_packet(self, data):
+        # Network thread
+        now = monotonic()
+        with self.lock:
+            if self.sink is not None:
+                self.sink(data, now)
+            if self.seconds <= 0:
+                return
+            if contains_keyframe(data) or not self.gops:
+                self.gops.append([])
+            self.gops[-1].append((now, data))
+            self.bytes += len(data)
+            self.trim(now)
+
+    def trim(self, now):
+        # Keep the newest GOP that started at or before the cut-off, so
+        # there are always at least `seconds` to replay
+        cutoff = now - self.seconds
+        while len(self.gops) > 1 and (self.gops[1][0][0] <= cutoff or self.bytes > self.max_bytes):
+            self.bytes -= sum(len(data) for _, data in self.gops.popleft())
+
+    def attach(self, sink):
+        # sink(data, received) is called under the buffer's lock and must
+        # only queue the data
+        with self.lock:
+            for gop in self.gops:
+                # One write per GOP: the stream is a byte pipe to the
+                # recorder, and a burst of single packets would overflow
+                # its queue
+                sink(b"".join(data for _, data in gop), gop[0][0])
+            self.sink = sink
+
+    def detach(self):
+        with self.lock:
+            self.sink = None
@@ -0,0 +1,88 @@
+import logging
+
+from threading import Lock
+from time import monotonic
+
+from PySide6.QtCore import QObject, Signal
+
+from manager.Telemetry import TelemetryState, FIELDS, changed_fields
+
+logger = logging.getLogger(__name__)
+
+
+class SessionSignals(QObject):
+    # Carries results from the network thread onto the GUI thread. Signals
+    # emitted from another thread are queued and delivered by the Qt event
+    # loop, so slots may touch widgets directly.
+    telemetry = Signal(object)
+    command_finished = Signal(object)
+    connected = Signal(bool)
+
+    def __init__(self, session, parent=None, telemetry_rate=None, fields=FIELDS):
+        # telemetry_rate caps GUI updates per second; None passes every
+        # packet that changes one of `fields`
+        super().__init__(parent)
+        self.session = session
+        self.fields = fields
+        self.interval = 1.0 / telemetry_rate if telemetry_rate else 0.0
+        self.telemetry_lock = Lock()
+        self.telemetry_queued = False
+        self.flush_scheduled = False
+        self.last_emit = 0.0
+        self.latest_state = None
+        self.delivered_state = TelemetryState()
+        session.subscribe_telemetry(self.on_telemetry)
+
+    def on_telemetry(self, state):
+        # At most one telemetry update waits in the GUI's event queue; a busy
+        # GUI thread gets the newest state instead of a backlog
+        with self.telemetry_lock:
+            self.latest_state = state
+            if self.telemetry_queued or self.flush_scheduled:
+                return
+            if not changed_fields(self.delivered_state, state, self.fields):
+                return
+            delay = self.last_emit + self.interval - monotonic()
+            if delay > 0:
+                # Sent once the interval is up, with whatever is newest then
+                self.flush_scheduled = True
+                self.session.hub.call_later(delay, self.flush)
+                return
+            self.telemetry_queued = True
+            self.last_emit = monotonic()
+        self.telemetry.emit(self)
+
+    def flush(self):
+        with self.telemetry_lock:
+            self.flush_scheduled = False
+            if self.telemetry_queued:
+                return
+            self.telemetry_queued = True
+            self.last_emit = monotonic()
+        self.telemetry.emit(self)
+
+    def take_telemetry(self):
+        # The newest state and the fields that differ from the last one taken
+        with self.telemetry_lock:
+            self.telemetry_queued = False
+            state = self.latest_state
+            changed = changed_fields(self.delivered_state, state, self.fields)
+            self.delivered_state = state
+        return state, changed
+
+    def connect_session(self):
+        # Blocking handshake; run off the GUI thread, the outcome arrives
+        # through the connected signal
+        try:
+            connected = self.session.connect()
+        except Exception as e:
+            logger.error(f"Connecting to the drone failed: {e}")
+            connected = False
+        self.connected.emit(connected)
+
+    def send(self, command):
+        # Async command whose reply arrives through command_finished
+        return self.session.send_msg_async(command, self.command_finished.emit)
+
+    def close(self):
+        self.session.unsubscribe_telemetry(self.on_telemetry)
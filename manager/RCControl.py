@@ -0,0 +1,59 @@
+DEFAULT_AXIS_MAP = {
+    "lr": 0,
+    "fb": 1,
+    "yaw": 2,
+    "ud": None,
+}
+
+
+class RCControl:
+    def __init__(self, axis_map=None, speed_axis=3, deadband=0.08, expo=0.4,
+                 max_rc=100, button_throttle=50, speed_step=5):
+        self.axis_map = dict(DEFAULT_AXIS_MAP if axis_map is None else axis_map)
+        self.speed_axis = speed_axis
+        self.deadband = deadband
+        self.expo = expo
+        self.max_rc = max_rc
+        self.button_throttle = button_throttle
+        self.speed_step = speed_step
+
+    def shape(self, value):
+        magnitude = abs(value)
+        if magnitude <= self.deadband:
+            return 0.0
+        # Rescale so the output starts at zero right at the deadband edge
+        magnitude = min((magnitude - self.deadband) / (1.0 - self.deadband), 1.0)
+        magnitude = (1.0 - self.expo) * magnitude + self.expo * magnitude ** 3
+        return magnitude if value > 0 else -magnitude
+
+    def channel(self, axes, name):
+        index = self.axis_map.get(name)
+        if index is None or index >= len(axes):
+            return 0
+        return int(round(self.shape(axes[index]) * self.max_rc))
+
+    def build(self, axes, up=False, down=False):
+        lr = self.channel(axes, "lr")
+        # Pushing the stick forward reports a negative value
+        fb = -self.channel(axes, "fb")
+        ud = self.channel(axes, "ud")
+        yaw = self.channel(axes, "yaw")
+
+        if up and not down:
+            ud = self.button_throttle
+        elif down and not up:
+            ud = -self.button_throttle
+
+        return lr, fb, ud, yaw
+
+    @staticmethod
+    def format(channels):
+        return "rc {} {} {} {}".format(*channels)
+
+    def speed(self, axes):
+        if self.speed_axis is None or self.speed_axis >= len(axes):
+            return None
+        speed = 100 - (axes[self.speed_axis] + 1) * 45
+        # Quantize so stick noise does not turn into a stream of speed commands
+        speed = int(round(speed / self.speed_step) * self.speed_step)
+        return max(10, min(100, speed))
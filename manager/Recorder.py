@@ -0,0 +1,238 @@
+import os
+import queue
+import logging
+import shutil
+import subprocess
+
+from threading import Thread
+
+from manager.OpenCVLoader import load_opencv
+
+PASSTHROUGH = "passthrough"
+REENCODE = "reencode"
+OPENCV = "opencv"
+
+FFMPEG = shutil.which("ffmpeg")
+# The drone's stream carries no timestamps; it runs at a steady 30 fps
+STREAM_FPS = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+def ffmpeg_available():
+    return FFMPEG is not None
+
+
+def container_args(path):
+    # Fragmented MP4 is playable up to the last fragment even if ffmpeg
+    # never gets to write the index at the end
+    if path.endswith(".mp4"):
+        return ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+    return []
+
+
+def contains_keyframe(data):
+    # Annex B start code followed by an SPS (7) or IDR slice (5)
+    index = data.find(b"\x00\x00\x01")
+    while index != -1 and index + 3 < len(data):
+        if data[index + 3] & 0x1F in (5, 7):
+            return True
+        index = data.find(b"\x00\x00\x01", index + 3)
+    return False
+
+
+class FFmpegRecorder:
+    wants_packets = False
+    wants_frames = False
+
+    # input_args describe what is piped to ffmpeg, output_args how it is
+    # written; both are lists of ffmpeg options
+    def __init__(self, path, input_args, output_args, max_pending=256):
+        self.path = path
+        self.input_args = input_args
+        self.output_args = output_args
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.process = None
+        self.writer_thread = None
+        self.dropped = 0
+        self.paused = False
+
+    def start(self):
+        command = [FFMPEG, "-hide_banner", "-loglevel", "error"]
+        command += self.input_args + ["-i", "pipe:0"] + self.output_args + container_args(self.path)
+        command += ["-y", self.path]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        self.writer_thread = Thread(target=self.write_loop, daemon=True)
+        self.writer_thread.start()
+
+    def submit(self, data):
+        # Called from the capture side; a slow encoder costs dropped data, never a stall
+        try:
+            self.pending.put_nowait(data)
+        except queue.Full:
+            self.dropped += 1
+
+    def write_loop(self):
+        while True:
+            data = self.pending.get()
+            if data is None:
+                break
+            try:
+                self.process.stdin.write(data)
+            except (BrokenPipeError, OSError) as e:
+                logger.error(f"Recorder pipe closed: {e}")
+                break
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.pending.put(None)
+        self.writer_thread.join()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        # ffmpeg writes the container index on a clean exit
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.process = None
+
+    def discard(self):
+        # Never written to, so there is no file to finish
+        if self.process is None:
+            return
+        self.process.kill()
+        self.pending.put(None)
+        self.writer_thread.join()
+        self.process.wait()
+        self.process = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class PassthroughRecorder(FFmpegRecorder):
+    # Remuxes the drone's H.264 elementary stream without decoding it
+    wants_packets = True
+
+    def __init__(self, path, max_pending=1024, fps=STREAM_FPS):
+        # Timestamps follow the stream's frame rate rather than arrival
+        # time, so packets replayed from the pre-roll keep their pacing
+        input_args = ["-fflags", "+genpts", "-framerate", f"{fps:g}", "-f", "h264"]
+        super().__init__(path, input_args, ["-map", "0:v", "-c", "copy"], max_pending)
+        self.fps = fps
+        self.waiting_for_keyframe = True
+
+    def write_packet(self, data):
+        if self.paused:
+            return
+        if self.waiting_for_keyframe:
+            if not contains_keyframe(data):
+                return
+            self.waiting_for_keyframe = False
+        self.submit(data)
+
+    def resume(self):
+        # Restart on a keyframe so the file never references frames it lacks
+        self.waiting_for_keyframe = True
+        super().resume()
+
+
+class ReencodeRecorder(FFmpegRecorder):
+    # Encodes filtered BGR frames in an ffmpeg child process
+    wants_frames = True
+
+    def __init__(self, path, max_pending=32, preset="veryfast"):
+        output_args = [
+            "-c:v", "libx264", "-preset", preset, "-tune", "zerolatency",
+            "-pix_fmt", "yuv420p", "-vsync", "vfr",
+        ]
+        # The input args need the frame size, filled in by the first frame
+        super().__init__(path, None, output_args, max_pending)
+        self.preset = preset
+        self.size = None
+
+    def start(self):
+        # The frame size is only known once the first frame arrives
+        pass
+
+    def write_frame(self, frame):
+        if self.paused:
+            return
+        if self.process is None:
+            self.size = (frame.shape[1], frame.shape[0])
+            self.input_args = [
+                "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{self.size[0]}x{self.size[1]}",
+                "-use_wallclock_as_timestamps", "1",
+            ]
+            super().start()
+        elif (frame.shape[1], frame.shape[0]) != self.size:
+            frame = load_opencv().resize(frame, self.size)
+        # Filtered frames live in reused buffers, so queue a copy
+        self.submit(frame.tobytes())
+
+
+class OpenCVRecorder:
+    # Fallback when ffmpeg is not installed
+    wants_packets = False
+    wants_frames = True
+
+    def __init__(self, path, fps=20.0):
+        self.path = path
+        self.fps = fps
+        self.writer = None
+        self.size = None
+        self.dropped = 0
+        self.paused = False
+
+    def start(self):
+        pass
+
+    def write_frame(self, frame):
+        cv = load_opencv()
+        if self.paused:
+            return
+        if self.writer is None:
+            self.size = (frame.shape[1], frame.shape[0])
+            self.writer = cv.VideoWriter(self.path, cv.VideoWriter_fourcc(*"mp4v"), self.fps, self.size)
+        elif (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv.resize(frame, self.size)
+        self.writer.write(frame)
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def stop(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+
+    def discard(self):
+        self.stop()
+
+
+def resolve_mode(mode):
+    if mode in (PASSTHROUGH, REENCODE) and not ffmpeg_available():
+        logger.warning("ffmpeg not found, recording with OpenCV instead")
+        return OPENCV
+    return mode
+
+
+def create_recorder(mode, path):
+    # Writes a single file; see SegmentedRecorder for recordings
+    mode = resolve_mode(mode)
+    if mode == PASSTHROUGH:
+        return PassthroughRecorder(path)
+    if mode == REENCODE:
+        return ReencodeRecorder(path)
+    return OpenCVRecorder(path)
@@ -0,0 +1,196 @@
+import os
+import logging
+
+from datetime import datetime
+from threading import Lock, Thread
+from time import monotonic, time
+
+from manager.Recorder import create_recorder, resolve_mode, contains_keyframe, PASSTHROUGH
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.csv"
+
+# Why a segment ended, as recorded in the index
+DURATION = "duration"
+PAUSED = "paused"
+STOPPED = "stopped"
+
+
+class Segment:
+    def __init__(self, writer, number, name):
+        self.writer = writer
+        self.number = number
+        self.name = name
+        self.first = None
+        self.last = None
+
+    def note(self, received):
+        if self.first is None:
+            self.first = received
+        self.last = received
+
+    @property
+    def duration(self):
+        return self.last - self.first if self.first is not None else 0.0
+
+
+class RecordingIndex:
+    # One line per finished segment, written and synced as soon as the
+    # segment is finalized, so after a crash the index still lists
+    # everything that was closed
+    def __init__(self, path, clock_offset):
+        self.path = path
+        self.clock_offset = clock_offset
+        with open(path, "w") as f:
+            f.write("segment,file,started,duration_s,ended_by\n")
+
+    def append(self, segment, reason):
+        started = datetime.fromtimestamp(segment.first + self.clock_offset).isoformat(timespec="milliseconds")
+        with open(self.path, "a") as f:
+            f.write(f"{segment.number},{segment.name},{started},{segment.duration:.3f},{reason}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class SegmentedRecorder:
+    # Writes a recording as a directory of fixed-length segments plus an
+    # index. Each segment is its own file with its own writer, so a crash
+    # costs at most the segment in progress, and pausing simply ends the
+    # current segment. The next segment's writer is started ahead of time
+    # and finished ones are closed on a background thread, so switching
+    # segments never blocks the thread feeding the recorder. Packet
+    # segments start on a keyframe.
+    def __init__(self, mode, directory, container="mp4", segment_duration=60.0):
+        self.mode = resolve_mode(mode)
+        self.path = directory
+        self.container = container
+        self.segment_duration = segment_duration
+        self.wants_packets = self.mode == PASSTHROUGH
+        self.wants_frames = not self.wants_packets
+        # Maps monotonic receive times to wall-clock ones for the index
+        self.clock_offset = time() - monotonic()
+        self.index = None
+        self.lock = Lock()
+        self.current = None
+        self.spare = None
+        self.next_number = 0
+        self.paused = False
+        self.stopped = False
+        self.last_finalizer = None
+        self.closed_dropped = 0
+
+    @property
+    def dropped(self):
+        current = self.current
+        return self.closed_dropped + (current.writer.dropped if current else 0)
+
+    def start(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.index = RecordingIndex(os.path.join(self.path, INDEX_FILE), self.clock_offset)
+        self.spare = self.new_segment()
+
+    def new_segment(self):
+        with self.lock:
+            number = self.next_number
+            self.next_number += 1
+        name = f"segment_{number:04d}.{self.container}"
+        writer = create_recorder(self.mode, os.path.join(self.path, name))
+        writer.start()
+        return Segment(writer, number, name)
+
+    def prepare_spare(self):
+        segment = self.new_segment()
+        with self.lock:
+            if not self.stopped:
+                self.spare = segment
+                return
+        segment.writer.discard()
+
+    def open_spare(self):
+        # Lock held
+        self.current, self.spare = self.spare, None
+        Thread(target=self.prepare_spare, daemon=True, name="record-spare").start()
+        return self.current
+
+    def close_current(self, reason):
+        # Lock held
+        segment, self.current = self.current, None
+        self.closed_dropped += segment.writer.dropped
+        previous = self.last_finalizer
+        # Not a daemon: a finalize in progress at exit still completes
+        self.last_finalizer = Thread(target=self.finalize, args=(segment, reason, previous), name="record-finalize")
+        self.last_finalizer.start()
+
+    def finalize(self, segment, reason, previous):
+        try:
+            segment.writer.stop()
+        except Exception as e:
+            logger.error(f"Failed to finalize {segment.name}: {e}")
+        # Index lines stay in segment order
+        if previous is not None:
+            previous.join()
+        try:
+            self.index.append(segment, reason)
+        except OSError as e:
+            logger.error(f"Failed to update recording index: {e}")
+
+    def due(self, received):
+        # A segment is only cut once its successor's writer is ready
+        return received - self.current.first >= self.segment_duration and self.spare is not None
+
+    def write_packet(self, data, received=None):
+        # Network thread; received is when the packet arrived, which for
+        # pre-roll packets lies before the recording started
+        if received is None:
+            received = monotonic()
+        with self.lock:
+            if self.paused or self.stopped:
+                return
+            if self.current is not None and self.due(received) and contains_keyframe(data):
+                self.close_current(DURATION)
+            if self.current is None:
+                if self.spare is None or not contains_keyframe(data):
+                    return
+                self.open_spare()
+            self.current.note(received)
+            self.current.writer.write_packet(data)
+
+    def write_frame(self, frame):
+        received = monotonic()
+        with self.lock:
+            if self.paused or self.stopped:
+                return
+            if self.current is not None and self.due(received):
+                self.close_current(DURATION)
+            if self.current is None:
+                if self.spare is None:
+                    return
+                self.open_spare()
+            self.current.note(received)
+            self.current.writer.write_frame(frame)
+
+    def pause(self):
+        with self.lock:
+            self.paused = True
+            if self.current is not None:
+                self.close_current(PAUSED)
+
+    def resume(self):
+        with self.lock:
+            self.paused = False
+
+    def stop(self):
+        # Returns straight away; wait() blocks until every segment is closed
+        with self.lock:
+            self.stopped = True
+            if self.current is not None:
+                self.close_current(STOPPED)
+            spare, self.spare = self.spare, None
+        if spare is not None:
+            spare.writer.discard()
+
+    def wait(self, timeout=None):
+        finalizer = self.last_finalizer
+        if finalizer is not None:
+            finalizer.join(timeout)
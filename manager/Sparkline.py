@@ -0,0 +1,145 @@
+import numpy as np
+
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import Qt, QPointF
+from PySide6.QtGui import QPainter, QPixmap, QColor, QPen, QPolygonF, QFont
+
+SERIES_COLORS = (QColor(80, 200, 255), QColor(255, 170, 60), QColor(140, 230, 110))
+
+
+class Sparkline(QWidget):
+    # Rolling plot of the last `capacity` samples of one or more fields of a
+    # TelemetryHistory, one point per state packet the drone sent. The plot
+    # is kept in a pixmap that is scrolled and extended by the new segments
+    # only, and redrawn in full only when resized or when a value leaves the
+    # range.
+    def __init__(self, title, history, series, value_range=None, capacity=300, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.history = history
+        self.series = tuple(series)
+        self.capacity = capacity
+        self.count = history.count
+        self.drawn = self.count
+        self.latest = ()
+        # A fixed range never forces a full redraw; without one it only grows
+        self.fixed_range = value_range is not None
+        self.low, self.high = value_range if value_range else (0.0, 1.0)
+        self.pixmap = None
+        self.pens = [QPen(SERIES_COLORS[i % len(SERIES_COLORS)], 1.5) for i in range(len(self.series))]
+        self.setMinimumHeight(60)
+
+    def window(self, size):
+        # The newest `size` samples, oldest first, one row per series
+        size = min(size, self.count)
+        return np.array([self.history.column(name, last=size, end=self.count) for name in self.series])
+
+    def refresh(self):
+        # GUI thread, on a timer; picks up whatever the drone sent since
+        count = self.history.count
+        if count == self.count:
+            return
+        new = min(count - self.count, self.capacity)
+        self.count = count
+        values = self.window(new)
+        self.latest = values[:, -1]
+        if self.widen(values):
+            self.pixmap = None
+        self.extend()
+        self.update()
+
+    def widen(self, values):
+        # Grows an automatic range to take in values; True if it had to
+        finite = values[np.isfinite(values)]
+        if self.fixed_range or not finite.size or (finite.min() >= self.low and finite.max() <= self.high):
+            return False
+        self.low = min(self.low, float(finite.min()))
+        self.high = max(self.high, float(finite.max()))
+        return True
+
+    def x_step(self):
+        # Whole pixels per sample, so scrolling the pixmap stays exact; the
+        # newest sample is always at the right edge
+        return max(1, (self.width() - 1) // (self.capacity - 1))
+
+    def y_of(self, value):
+        value = min(max(value, self.low), self.high)
+        span = (self.high - self.low) or 1.0
+        return (self.height() - 2) * (1.0 - (value - self.low) / span) + 1
+
+    def redraw(self):
+        self.pixmap = QPixmap(self.size())
+        self.pixmap.fill(Qt.black)
+        data = self.window(self.capacity)
+        self.widen(data)
+        offset = self.capacity - data.shape[1]
+        step = self.x_step()
+        x_end = self.width() - 1
+        painter = QPainter(self.pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        for pen, values in zip(self.pens, data):
+            painter.setPen(pen)
+            # NaN gaps split the line
+            points = []
+            for i, value in enumerate(values):
+                if value != value:
+                    if len(points) > 1:
+                        painter.drawPolyline(QPolygonF(points))
+                    points = []
+                    continue
+                points.append(QPointF(x_end - (self.capacity - 1 - offset - i) * step, self.y_of(value)))
+            if len(points) > 1:
+                painter.drawPolyline(QPolygonF(points))
+        painter.end()
+        self.drawn = self.count
+
+    def extend(self):
+        if self.width() < 2 or self.height() < 2:
+            # Not laid out yet; the first paint draws everything
+            return
+        if self.pixmap is None or self.pixmap.size() != self.size():
+            self.redraw()
+            return
+        new = self.count - self.drawn
+        if new <= 0:
+            return
+        if new >= self.capacity:
+            self.redraw()
+            return
+        step = self.x_step()
+        shift = new * step
+        self.pixmap.scroll(-shift, 0, self.pixmap.rect())
+        painter = QPainter(self.pixmap)
+        painter.fillRect(self.width() - shift, 0, shift, self.height(), Qt.black)
+        painter.setRenderHint(QPainter.Antialiasing)
+        x_end = self.width() - 1
+        # Segments start at the last sample already drawn
+        rows = self.window(new + 1)
+        for pen, row in zip(self.pens, rows):
+            painter.setPen(pen)
+            for k in range(new, 0, -1):
+                a = row[-k - 1] if len(row) > k else np.nan
+                b = row[-k]
+                if a != a or b != b:
+                    continue
+                x1 = x_end - (k - 1) * step
+                painter.drawLine(QPointF(x1 - step, self.y_of(a)), QPointF(x1, self.y_of(b)))
+        painter.end()
+        self.drawn = self.count
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.pixmap = None
+
+    def paintEvent(self, event):
+        if self.pixmap is None or self.pixmap.size() != self.size():
+            self.redraw()
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.pixmap)
+        painter.setFont(QFont("Sans", 9))
+        painter.setPen(Qt.white)
+        text = self.title + "  " + "  ".join(
+            f"{name} {value:.0f}" for name, value in zip(self.series, self.latest) if value == value
+        )
+        painter.drawText(4, painter.fontMetrics().ascent() + 2, text)
+        painter.end()
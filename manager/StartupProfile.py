@@ -0,0 +1,67 @@
+import logging
+
+from contextlib import contextmanager
+from threading import Lock, current_thread
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    # Records when each part of startup began and finished, relative to the
+    # first import of this module, across the GUI and background threads.
+    # Once every expected milestone is reached the breakdown is logged.
+    def __init__(self):
+        self.origin = perf_counter()
+        self.entries = []
+        self.expected = None
+        self.reported = False
+        self.lock = Lock()
+
+    def elapsed(self):
+        return perf_counter() - self.origin
+
+    def record(self, name, start, end):
+        with self.lock:
+            self.entries.append((name, start, end, current_thread().name))
+            complete = False
+            if self.expected is not None:
+                self.expected.discard(name)
+                complete = not self.expected and not self.reported
+        if complete:
+            self.report()
+
+    def mark(self, name):
+        now = self.elapsed()
+        self.record(name, now, now)
+
+    @contextmanager
+    def span(self, name):
+        start = self.elapsed()
+        try:
+            yield
+        finally:
+            self.record(name, start, self.elapsed())
+
+    def expect(self, *names):
+        with self.lock:
+            reached = {entry[0] for entry in self.entries}
+            self.expected = (self.expected or set()) | (set(names) - reached)
+
+    def report(self):
+        with self.lock:
+            if self.reported:
+                return
+            self.reported = True
+            entries = sorted(self.entries, key=lambda e: e[2])
+            missing = sorted(self.expected or ())
+        lines = [f"Startup breakdown ({entries[-1][2] * 1000:.0f} ms):" if entries else "Startup breakdown:"]
+        for name, start, end, thread in entries:
+            duration = f"{(end - start) * 1000:7.0f} ms" if end > start else " " * 10
+            lines.append(f"  {end * 1000:7.0f} ms  {name:<24}{duration}  [{thread}]")
+        for name in missing:
+            lines.append(f"  {'--':>7}     {name:<24}not reached")
+        logger.info("\n".join(lines))
+
+
+startup = StartupProfile()
@@ -0,0 +1,63 @@
+import socket
+
+from manager.NetworkHub import get_default_hub, ANY_HOST
+
+RELAY_HOST = "127.0.0.1"
+
+
+def free_port():
+    # Each session's decoder gets its own loopback port
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind((RELAY_HOST, 0))
+        return sock.getsockname()[1]
+
+
+class StreamRelay:
+    # Owns the drone's H.264 UDP port so the raw stream can be tapped (e.g. for
+    # passthrough recording) and still reach the decoder over loopback
+    def __init__(self, listen_port=11111, forward_port=None, host=ANY_HOST, hub=None):
+        # host picks one drone's packets when several stream to the same port
+        self.listen_port = listen_port
+        self.host = host
+        self.hub = hub or get_default_hub()
+        self.forward_addr = (RELAY_HOST, forward_port or free_port())
+        self.sinks = ()
+        # Off when a sink decodes the stream itself and no loopback decoder listens
+        self.forwarding = True
+        self.running = False
+        self.packets = 0
+        self.bytes = 0
+
+    @property
+    def decoder_url(self):
+        return f"udp://@{self.forward_addr[0]}:{self.forward_addr[1]}"
+
+    def add_sink(self, sink):
+        # Tuples are swapped whole so the relay thread never sees a half-updated list
+        self.sinks = self.sinks + (sink,)
+
+    def remove_sink(self, sink):
+        self.sinks = tuple(s for s in self.sinks if s != sink)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.listen_port = self.hub.open(self.listen_port, recv_buffer=1 << 20)
+        self.hub.register(self.listen_port, self.host, self.on_packet)
+
+    def on_packet(self, data, addr):
+        # Runs on the network thread; sinks must only queue the data
+        self.packets += 1
+        self.bytes += len(data)
+        if self.forwarding:
+            self.hub.sendto(self.listen_port, data, self.forward_addr, droppable=True)
+        for sink in self.sinks:
+            sink(data)
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.hub.unregister(self.listen_port, self.host)
+        self.hub.close(self.listen_port)
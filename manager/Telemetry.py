@@ -0,0 +1,66 @@
+from math import isnan
+from time import monotonic
+
+NAN = float("nan")
+
+# Keys exactly as they appear in the drone's state packet
+FIELDS = (
+    "pitch", "roll", "yaw",
+    "vgx", "vgy", "vgz",
+    "templ", "temph",
+    "tof", "h", "bat", "baro", "time",
+    "agx", "agy", "agz",
+)
+FIELD_SET = frozenset(FIELDS)
+
+
+class TelemetryState:
+    # Published by reference swap and never modified afterwards, so readers can
+    # hold on to one without copying or locking
+    __slots__ = FIELDS + ("seq", "timestamp")
+
+    def __init__(self, seq=0, timestamp=0.0):
+        for name in FIELDS:
+            setattr(self, name, NAN)
+        self.seq = seq
+        self.timestamp = timestamp
+
+    @property
+    def temperature(self):
+        return (self.templ + self.temph) / 2
+
+    @property
+    def speed(self):
+        return (abs(self.vgx) + abs(self.vgy) + abs(self.vgz)) / 3
+
+    def is_valid(self, name):
+        return not isnan(getattr(self, name))
+
+
+def parse_state(state_str, seq=0):
+    state = TelemetryState(seq, monotonic())
+    for item in state_str.split(";"):
+        key, sep, value = item.partition(":")
+        if sep and key in FIELD_SET:
+            try:
+                setattr(state, key, float(value))
+            except ValueError:
+                pass
+    return state
+
+
+def changed_fields(previous, state, fields=FIELDS):
+    changed = set()
+    for name in fields:
+        old = getattr(previous, name)
+        new = getattr(state, name)
+        # NaN never equals itself; two missing values are no change
+        if old != new and not (isnan(old) and isnan(new)):
+            changed.add(name)
+    return changed
+
+
+def format_value(value, spec=".0f"):
+    if isnan(value):
+        return "--"
+    return format(value, spec)
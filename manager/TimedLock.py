@@ -0,0 +1,62 @@
+from threading import Lock
+from time import perf_counter
+
+
+class TimedLock:
+    # Drop-in Lock that records how long callers waited for it and how long
+    # it was held. Only the holder updates the counters, so they need no
+    # extra synchronization.
+    def __init__(self, name):
+        self.name = name
+        self.lock = Lock()
+        self.acquired_at = 0.0
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self.lock.acquire(False):
+            waited = 0.0
+        else:
+            if not blocking:
+                return False
+            start = perf_counter()
+            if not self.lock.acquire(True, timeout):
+                return False
+            waited = perf_counter() - start
+            self.contended += 1
+
+        self.acquisitions += 1
+        self.wait_total += waited
+        if waited > self.wait_max:
+            self.wait_max = waited
+        self.acquired_at = perf_counter()
+        return True
+
+    def release(self):
+        held = perf_counter() - self.acquired_at
+        self.hold_total += held
+        if held > self.hold_max:
+            self.hold_max = held
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def stats(self):
+        count = self.acquisitions or 1
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "wait_avg_us": self.wait_total / count * 1e6,
+            "wait_max_us": self.wait_max * 1e6,
+            "hold_avg_us": self.hold_total / count * 1e6,
+            "hold_max_us": self.hold_max * 1e6,
+        }
@@ -0,0 +1,107 @@
+from time import monotonic, perf_counter
+
+from PySide6.QtWidgets import QLabel
+from PySide6.QtCore import Signal, Qt
+from PySide6.QtGui import QImage, QPainter, QColor, QFont
+
+from manager.Instrumentation import metrics
+
+
+class VideoWidget(QLabel):
+    frame_ready = Signal()
+
+    def __init__(self, text=""):
+        super().__init__(text)
+        self.pipeline = None
+        self.image = None
+        self.buffer = None
+        self.frame_seq = None
+        self.overlay_lines = None
+        self.alert_text = None
+        self.paint_ms = metrics.histogram("gui.paint_ms")
+
+    def set_pipeline(self, pipeline):
+        self.pipeline = pipeline
+        pipeline.set_output_size(self.width(), self.height())
+        # Emitted from the decode thread, delivered on the GUI thread
+        pipeline.frame_callback = self.frame_ready.emit
+
+    def show_latest_frame(self):
+        if self.pipeline is None:
+            return False
+        seq, buffer, published_at = self.pipeline.acquire()
+        if buffer is None or seq == self.frame_seq:
+            return False
+        governor = self.pipeline.governor
+        if governor is not None:
+            governor.record_lag((monotonic() - published_at) * 1000)
+
+        # QImage wraps the ring slot directly; keeping the array referenced
+        # keeps the memory alive even if the pipeline reallocates its ring
+        height, width = buffer.shape[:2]
+        self.buffer = buffer
+        self.image = QImage(buffer.data, width, height, buffer.strides[0], QImage.Format_RGB888)
+        self.frame_seq = seq
+        self.update()
+        return True
+
+    def set_overlay(self, lines):
+        # Text drawn over the video, e.g. live metrics; None hides it
+        self.overlay_lines = lines
+        self.update()
+
+    def set_alert(self, text):
+        # Warning banner across the bottom of the video; None hides it. Unlike a
+        # message box it never blocks the GUI thread or the video.
+        self.alert_text = text
+        self.update()
+
+    def draw_alert(self, painter):
+        painter.setFont(QFont("Sans", 18, QFont.Bold))
+        height = painter.fontMetrics().height() + 16
+        top = self.height() - height
+        painter.fillRect(0, top, self.width(), height, QColor(180, 0, 0, 200))
+        painter.setPen(Qt.white)
+        painter.drawText(0, top, self.width(), height, Qt.AlignCenter, self.alert_text)
+
+    def draw_overlay(self, painter):
+        painter.setFont(QFont("Monospace", 10))
+        line_height = painter.fontMetrics().height()
+        width = max(painter.fontMetrics().horizontalAdvance(line) for line in self.overlay_lines)
+        painter.fillRect(4, 4, width + 12, line_height * len(self.overlay_lines) + 8, QColor(0, 0, 0, 160))
+        painter.setPen(Qt.green)
+        for i, line in enumerate(self.overlay_lines):
+            painter.drawText(10, 8 + line_height * (i + 1) - painter.fontMetrics().descent(), line)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.pipeline is not None:
+            self.pipeline.set_output_size(self.width(), self.height())
+
+    def paintEvent(self, event):
+        if self.image is None:
+            super().paintEvent(event)
+            if self.alert_text:
+                painter = QPainter(self)
+                self.draw_alert(painter)
+                painter.end()
+            return
+        start = perf_counter()
+        painter = QPainter(self)
+        if self.image.width() < self.width() and self.image.height() < self.height():
+            # The governor lowered the display resolution; stretch back up
+            painter.drawImage(self.rect(), self.image)
+        else:
+            x = (self.width() - self.image.width()) // 2
+            y = (self.height() - self.image.height()) // 2
+            painter.drawImage(x, y, self.image)
+        if self.overlay_lines:
+            self.draw_overlay(painter)
+        if self.alert_text:
+            self.draw_alert(painter)
+        painter.end()
+        elapsed = (perf_counter() - start) * 1000
+        self.paint_ms.observe(elapsed)
+        governor = self.pipeline.governor if self.pipeline else None
+        if governor is not None:
+            governor.record("paint", elapsed)
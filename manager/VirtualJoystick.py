@@ -0,0 +1,53 @@
+from threading import Lock
+
+
+class VirtualJoystick:
+    # Stands in for pygame.joystick.Joystick so Controller can run headless,
+    # driven by a script or a benchmark instead of a device
+    def __init__(self, num_axes=6, num_buttons=12, name="Virtual Joystick"):
+        self.name = name
+        self.axes = [0.0] * num_axes
+        self.buttons = [False] * num_buttons
+        self.presses = []
+        self.lock = Lock()
+
+    def init(self):
+        pass
+
+    def get_name(self):
+        return self.name
+
+    def get_instance_id(self):
+        return -1
+
+    def get_numaxes(self):
+        return len(self.axes)
+
+    def get_numbuttons(self):
+        return len(self.buttons)
+
+    def get_axis(self, index):
+        return self.axes[index]
+
+    def get_button(self, index):
+        return self.buttons[index]
+
+    def set_axis(self, index, value):
+        self.axes[index] = max(-1.0, min(1.0, value))
+
+    def set_button(self, index, down):
+        with self.lock:
+            if down and not self.buttons[index]:
+                self.presses.append(index)
+            self.buttons[index] = down
+
+    def press(self, index):
+        # A tap: reported as pressed on the next sample even though the
+        # button is already up again
+        with self.lock:
+            self.presses.append(index)
+
+    def drain_presses(self):
+        with self.lock:
+            presses, self.presses = self.presses, []
+        return presses
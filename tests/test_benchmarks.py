@@ -0,0 +1,108 @@
+from threading import Event
+from time import perf_counter, sleep
+
+import pytest
+
+from manager.DroneSession import DroneEndpoints
+from manager.DroneSimulator import DroneSimulator
+from manager.H264Ingest import ingest_available
+from manager.MetricsSystem import MetricsSystem
+from manager.NetworkHub import NetworkHub
+from manager.Recorder import ffmpeg_available
+from manager.StreamRelay import free_port
+
+pytest.importorskip("pytest_benchmark")
+
+STATE_RATE = 100
+
+# Loose enough for a busy CI machine; a stalled scheduler, receive path or
+# decoder still fails them
+COMMAND_RTT_LIMIT = 0.05
+TELEMETRY_MIN_RATE = STATE_RATE * 0.8
+FRAME_LATENCY_LIMIT = 0.5
+
+
+@pytest.fixture
+def simulator():
+    simulator = DroneSimulator(command_port=free_port(), state_port=free_port(), video_port=free_port(),
+                               latency=0.0, state_rate=STATE_RATE, action_scale=0.01, seed=1).start()
+    yield simulator
+    simulator.stop()
+
+
+@pytest.fixture
+def system(simulator, tmp_path):
+    hub = NetworkHub()
+    endpoints = DroneEndpoints(simulator.host, simulator.command_port, local_port=0,
+                               state_port=simulator.state_port, video_port=simulator.video_port)
+    system = MetricsSystem(endpoints, hub=hub, log_dir=str(tmp_path))
+    assert system.init_sdk_mode()
+    system.start_telemetry()
+    yield system
+    system.stop_drone_operations()
+    hub.shutdown()
+
+
+def test_command_latency(benchmark, system):
+    # Paced like a pilot rather than flooded, so the command rate limit
+    # does not show up as latency
+    reply = benchmark.pedantic(system.send_msg, args=("command",), setup=lambda: sleep(0.02), rounds=50)
+    assert reply == "ok"
+    assert benchmark.stats.stats.median < COMMAND_RTT_LIMIT
+
+
+def test_telemetry_throughput(benchmark, system, simulator):
+    count = 50
+
+    def receive():
+        target = system.telemetry.seq + count
+        deadline = perf_counter() + 5.0
+        while system.telemetry.seq < target:
+            assert perf_counter() < deadline, "telemetry stalled"
+            sleep(0.001)
+
+    start_seq = system.telemetry.seq
+    start_sent = simulator.states_sent
+    benchmark.pedantic(receive, rounds=5)
+    received = system.telemetry.seq - start_seq
+    sent = simulator.states_sent - start_sent
+
+    rate = count / benchmark.stats.stats.median
+    benchmark.extra_info["telemetry_rate"] = rate
+    benchmark.extra_info["telemetry_loss"] = 1 - received / sent
+    assert rate > TELEMETRY_MIN_RATE
+    assert received >= sent * 0.95
+
+
+@pytest.mark.skipif(not ffmpeg_available() or not ingest_available(),
+                    reason="the simulator needs ffmpeg to encode its video, the session PyAV to decode it")
+def test_frame_latency(benchmark, system, simulator):
+    # Frame number drawn by the simulator before encoding, read back from
+    # each decoded frame: network, reassembly, jitter buffer and decode
+    latencies = []
+    arrived = Event()
+
+    def on_frame(frame):
+        latency = simulator.frame_latency(frame.image)
+        if latency is not None:
+            latencies.append(latency)
+        arrived.set()
+
+    def next_frame():
+        arrived.clear()
+        assert arrived.wait(2.0), "no frame decoded"
+
+    assert system.start_video_stream()
+    system.frame_processor.subscribe(on_frame)
+    try:
+        next_frame()
+        latencies.clear()
+        benchmark.pedantic(next_frame, rounds=60)
+    finally:
+        system.frame_processor.unsubscribe(on_frame)
+
+    latencies.sort()
+    median = latencies[len(latencies) // 2]
+    benchmark.extra_info["frame_latency_p50_ms"] = median * 1000
+    benchmark.extra_info["frame_latency_p95_ms"] = latencies[len(latencies) * 95 // 100] * 1000
+    assert median < FRAME_LATENCY_LIMIT
@@ -0,0 +1,47 @@
+from time import sleep
+
+import pytest
+
+from manager.CommandChannel import CommandChannel
+from manager.DroneSimulator import DroneSimulator
+from manager.NetworkHub import NetworkHub
+from manager.StreamRelay import free_port
+
+
+@pytest.fixture
+def simulator():
+    simulator = DroneSimulator(command_port=free_port(), state_port=free_port(), video=False,
+                               latency=0.002, seed=1).start()
+    yield simulator
+    simulator.stop()
+
+
+@pytest.fixture
+def channel(simulator):
+    hub = NetworkHub()
+    channel = CommandChannel(simulator.addr, local_port=0, hub=hub, retries=0)
+    yield channel
+    channel.close()
+    hub.shutdown()
+
+
+def test_late_reply_does_not_complete_next_command(channel, simulator):
+    # The answer to battery? arrives after it has timed out, while speed is
+    # on the wire
+    simulator.latency = 0.3
+    query = channel.send_async("battery?", timeout=0.2)
+    assert channel.send("speed 50", timeout=2.0) == "ok"
+    assert query.result(0) == "timeout"
+    assert channel.late_replies == 1
+
+
+def test_wait_timeout_cancels_queued_command(channel, simulator):
+    # Queued behind a 2 s takeoff, past what the caller will wait
+    simulator.action_scale = 1
+    takeoff = channel.send_async("takeoff")
+    query = channel.send_async("battery?", timeout=0.2)
+    assert channel.wait(query) == "timeout"
+    assert query.cancelled()
+    assert channel.wait(takeoff) == "ok"
+    sleep(0.1)
+    assert "battery?" not in simulator.commands
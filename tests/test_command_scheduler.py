@@ -0,0 +1,79 @@
+import statistics
+
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+import pytest
+
+from manager.CommandChannel import CommandChannel
+from manager.CommandScheduler import CommandScheduler
+from manager.Controller import MAX_CONTROL_RATE
+from manager.DroneSimulator import DroneSimulator
+from manager.NetworkHub import NetworkHub
+from manager.StreamRelay import free_port
+
+
+@pytest.fixture
+def simulator():
+    simulator = DroneSimulator(command_port=free_port(), state_port=free_port(), video=False,
+                               latency=0.002, seed=1).start()
+    yield simulator
+    simulator.stop()
+
+
+@pytest.fixture
+def scheduler(simulator):
+    hub = NetworkHub()
+    channel = CommandChannel(simulator.addr, local_port=0, hub=hub)
+    yield CommandScheduler(channel)
+    channel.close()
+    hub.shutdown()
+
+
+def test_commands_not_starved_by_rc_at_max_control_rate(scheduler):
+    stop = Event()
+
+    def control_loop():
+        # Paced on deadlines like the Controller, so rc really runs at 50 Hz
+        period = 1.0 / MAX_CONTROL_RATE
+        deadline = perf_counter()
+        while not stop.is_set():
+            scheduler.send_nowait("rc 0 0 0 0")
+            deadline += period
+            sleep(max(0.0, deadline - perf_counter()))
+
+    thread = Thread(target=control_loop, daemon=True)
+    thread.start()
+    try:
+        sleep(0.5)
+        delays = []
+        for _ in range(10):
+            start = perf_counter()
+            assert scheduler.send("battery?") != "timeout"
+            delays.append(perf_counter() - start)
+            sleep(0.05)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert statistics.median(delays) < 0.1
+    assert scheduler.stats()["sent"] > 10
+
+
+def test_send_waits_for_slow_command_ahead(scheduler, simulator):
+    # takeoff answers after 6 s, far beyond the query's own attempts
+    simulator.action_scale = 3
+    takeoff = scheduler.send_async("takeoff")
+    assert scheduler.send("battery?", timeout=0.5) == "100"
+    assert takeoff.result(0) == "ok"
+
+
+def test_withdrawn_command_never_sent(scheduler, simulator):
+    simulator.action_scale = 1
+    takeoff = scheduler.send_async("takeoff")
+    query = scheduler.send_async("battery?")
+    assert scheduler.withdraw(query)
+    assert query.result(0) == "timeout"
+    assert scheduler.channel.wait(takeoff) == "ok"
+    sleep(0.1)
+    assert "battery?" not in simulator.commands
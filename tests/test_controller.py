@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("PySide6")
+
+from manager.CommandChannel import CommandFuture
+from manager.Controller import Controller
+from manager.JoystickInput import JoystickSnapshot
+
+
+class FakeMetrics:
+    def __init__(self):
+        self.sent = []
+
+    def send_msg_async(self, command, callback=None, timeout=None):
+        future = CommandFuture(command, len(self.sent), 3.0)
+        if callback:
+            future.add_done_callback(callback)
+        self.sent.append(future)
+        return future
+
+    def send_msg_nowait(self, command):
+        pass
+
+
+def snapshot(speed_axis):
+    return JoystickSnapshot(0, 0.0, (0.0, 0.0, 0.0, speed_axis), (), frozenset())
+
+
+def speeds(metrics):
+    return [future.command for future in metrics.sent if future.command.startswith("speed")]
+
+
+def test_rejected_speed_is_sent_again():
+    controller = Controller()
+    metrics = FakeMetrics()
+    controller.handle_input(metrics, snapshot(0.0), False)
+    assert speeds(metrics) == ["speed 55"]
+
+    # Unchanged stick, still in flight: nothing new
+    controller.handle_input(metrics, snapshot(0.0), False)
+    assert len(speeds(metrics)) == 1
+
+    metrics.sent[-1].set_result("error")
+    controller.handle_input(metrics, snapshot(0.0), False)
+    assert speeds(metrics) == ["speed 55", "speed 55"]
+
+    metrics.sent[-1].set_result("ok")
+    controller.handle_input(metrics, snapshot(0.0), False)
+    assert len(speeds(metrics)) == 2
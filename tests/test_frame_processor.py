@@ -0,0 +1,23 @@
+import numpy as np
+
+from manager.FrameProcessor import FrameProcessor
+
+
+def invert(frame, out=None):
+    return np.subtract(255, frame, out=out)
+
+
+def test_held_frames_keep_their_pixels():
+    processor = FrameProcessor(invert)
+    held = [processor.process(np.full((4, 4, 3), i, np.uint8)) for i in range(10)]
+    for i, frame in enumerate(held):
+        assert (frame.image == 255 - i).all()
+
+
+def test_released_buffers_are_reused():
+    processor = FrameProcessor(invert)
+    raw = np.zeros((4, 4, 3), np.uint8)
+    image = processor.process(raw).image
+    # Still processor.latest while the second frame is filtered
+    assert processor.process(raw).image is not image
+    assert processor.process(raw).image is image
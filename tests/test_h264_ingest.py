@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from manager.H264Ingest import AccessUnitAssembler, H264Ingest, START_CODE, NAL_SPS, NAL_PPS, NAL_SEI
+
+av = pytest.importorskip("av")
+
+PACKET_SIZE = 1460
+
+
+def encode(count=60, size=(640, 480)):
+    encoder = av.CodecContext.create("libx264", "w")
+    encoder.width, encoder.height = size
+    encoder.pix_fmt = "yuv420p"
+    encoder.framerate = 30
+    encoder.options = {"preset": "ultrafast", "tune": "zerolatency", "g": "30", "bf": "0"}
+    rng = np.random.default_rng(1)
+    packets = []
+    for i in range(count):
+        img = np.zeros((size[1], size[0], 3), np.uint8)
+        img[:, :] = (i * 4) % 256
+        img[100:160] = rng.integers(0, 255, (60, size[0], 3), dtype=np.uint8)
+        frame = av.VideoFrame.from_ndarray(img, format="bgr24")
+        packets += [bytes(p) for p in encoder.encode(frame)]
+    packets += [bytes(p) for p in encoder.encode(None)]
+    return packets
+
+
+def split_nals(data):
+    nals = []
+    start = data.find(START_CODE)
+    while start != -1:
+        end = data.find(START_CODE, start + 3)
+        nals.append(data[start + 3:end if end != -1 else len(data)].rstrip(b"\x00"))
+        start = end
+    return nals
+
+
+def tello_datagrams(packets):
+    # As the drone sends them: parameter sets and SEI in short datagrams of
+    # their own, each picture in full-size datagrams closed by a short one
+    for packet in packets:
+        picture = b""
+        for nal in split_nals(packet):
+            if nal[0] & 0x1F in (NAL_SPS, NAL_PPS, NAL_SEI):
+                yield b"\x00\x00\x00\x01" + nal
+            else:
+                picture += b"\x00\x00\x00\x01" + nal
+        for i in range(0, len(picture), PACKET_SIZE):
+            yield picture[i:i + PACKET_SIZE]
+
+
+def test_parameter_sets_in_separate_datagrams():
+    packets = encode()
+    datagrams = list(tello_datagrams(packets))
+    assert any(len(d) < 64 and d[4] & 0x1F == NAL_SPS for d in datagrams)
+
+    units = []
+    assembler = AccessUnitAssembler(units.append)
+    for datagram in datagrams:
+        assembler.feed(datagram, 0.0)
+
+    assert len(units) == len(packets)
+    assert all(not unit.corrupt for unit in units)
+    assert units[0].keyframe and units[0].has_sps
+
+    shown = []
+    ingest = H264Ingest(shown.append, jitter=0.0)
+    ingest.prepare()
+    for unit in units:
+        ingest.handle(unit, show=True)
+    assert ingest.decode_errors == 0
+    assert len(shown) == len(packets)